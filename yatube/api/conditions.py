@@ -0,0 +1,107 @@
+"""
+Валидаторы условных запросов API.
+
+ETag строится из версий лент posts.feed_cache: версия растет при любом
+изменении заметок и комментариев ленты, поэтому ETag меняется и при
+правках, и при удалениях. Last-Modified — дата последней заметки; он
+не замечает правок, но клиенту, приславшему If-None-Match, Django
+отвечает по ETag и If-Modified-Since не проверяет.
+"""
+import hashlib
+
+from django.db.models import Max
+
+from posts import counters, feed_cache
+from posts.models import Comment, Group, Post, User
+
+API_VERSION = 1
+
+
+def _etag(request, feeds=(), extra=()):
+    parts = [API_VERSION, *feed_cache.get_versions(feeds), *extra]
+    parts.append(request.GET.urlencode())
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def _latest(queryset):
+    return queryset.order_by('-pub_date').values_list(
+        'pub_date', flat=True
+    ).first()
+
+
+def _author_id(username):
+    return User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+
+
+def _post_author_id(post_id):
+    return Post.objects.filter(pk=post_id).values_list(
+        'author', flat=True
+    ).first()
+
+
+def posts_etag(request):
+    return _etag(request, [feed_cache.feed_id('global')])
+
+
+def posts_modified(request):
+    return _latest(Post.objects.all())
+
+
+def group_posts_etag(request, slug):
+    return _etag(request, [feed_cache.feed_id('group', slug)])
+
+
+def group_posts_modified(request, slug):
+    return _latest(Post.objects.filter(group__slug=slug))
+
+
+def profile_posts_etag(request, username):
+    author_id = _author_id(username)
+    if author_id is None:
+        return None
+    return _etag(request, [feed_cache.feed_id('author', author_id)])
+
+
+def profile_posts_modified(request, username):
+    return _latest(Post.objects.filter(author__username=username))
+
+
+def profile_etag(request, username):
+    # Подписки не меняют ленту автора: счетчики входят в ETag отдельно
+    user = User.objects.filter(username=username).first()
+    if user is None:
+        return None
+    values = counters.for_user(user)
+    return _etag(
+        request,
+        [feed_cache.feed_id('author', user.pk)],
+        [values.posts_count, values.followers_count, values.following_count],
+    )
+
+
+def post_etag(request, post_id):
+    author_id = _post_author_id(post_id)
+    if author_id is None:
+        return None
+    return _etag(request, [feed_cache.feed_id('author', author_id)], [post_id])
+
+
+def post_modified(request, post_id):
+    published = Post.objects.filter(pk=post_id).values_list(
+        'pub_date', flat=True
+    ).first()
+    commented = Comment.objects.filter(post=post_id).aggregate(
+        latest=Max('created')
+    )['latest']
+    return max(filter(None, (published, commented)), default=None)
+
+
+def groups_etag(request):
+    rows = Group.objects.order_by('pk').values_list(
+        'pk', 'slug', 'title', 'description'
+    )
+    return _etag(request, extra=[hashlib.md5(
+        repr(list(rows)).encode()
+    ).hexdigest()])
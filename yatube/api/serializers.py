@@ -0,0 +1,57 @@
+"""Компактные словари для JSON: только поля, нужные клиентам."""
+from posts import thumbnails
+
+
+def _image(image):
+    if not image:
+        return None
+    return {'url': image.url, 'card': thumbnails.url(image, 'card')}
+
+
+def post(obj):
+    counters = getattr(obj, 'counters', None)
+    return {
+        'id': obj.pk,
+        'text': obj.text,
+        'pub_date': obj.pub_date.isoformat(),
+        'author': obj.author.username,
+        'group': obj.group.slug if obj.group_id else None,
+        'image': _image(obj.image),
+        'comments_count': counters.comments_count if counters else 0,
+    }
+
+
+def comment(obj):
+    return {
+        'id': obj.pk,
+        'text': obj.text,
+        'author': obj.author.username,
+        'created': obj.created.isoformat(),
+    }
+
+
+def group(obj):
+    return {
+        'slug': obj.slug,
+        'title': obj.title,
+        'description': obj.description,
+    }
+
+
+def profile(user, counters):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+        'posts_count': counters.posts_count,
+        'followers_count': counters.followers_count,
+        'following_count': counters.following_count,
+    }
+
+
+def page(page_obj, serializer):
+    """Страница курсорной пагинации: курсоры передаются в ?after/?before."""
+    return {
+        'results': [serializer(obj) for obj in page_obj],
+        'next': page_obj.next_cursor(),
+        'previous': page_obj.previous_cursor(),
+    }
@@ -0,0 +1,169 @@
+import csv
+import io
+import json
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Comment, Follow, Group, Post, User
+
+POSTS = reverse('api:posts')
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(settings.PAGE_SIZE + 3)
+        )
+        cls.post = Post.objects.create(
+            text='Свежий пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_posts_cursor_pages(self):
+        """Лента отдается страницами по курсору без рендера шаблонов."""
+        response = self.client.get(POSTS)
+        data = response.json()
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(data['results']), settings.PAGE_SIZE)
+        self.assertEqual(data['results'][0], {
+            'id': self.post.pk,
+            'text': 'Свежий пост',
+            'pub_date': self.post.pub_date.isoformat(),
+            'author': 'auth',
+            'group': 'test-slug',
+            'image': None,
+            'comments_count': 0,
+        })
+        data = self.client.get(POSTS, {'after': data['next']}).json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertIsNone(data['next'])
+
+    def test_etag_and_not_modified(self):
+        """Повторный запрос с ETag получает 304, изменения меняют ETag."""
+        etag = self.client.get(POSTS)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        response = self.client.get(POSTS, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.get(pk=self.post.pk).delete()
+        response = self.client.get(POSTS, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_if_modified_since(self):
+        """Last-Modified — дата последней заметки ленты."""
+        response = self.client.get(
+            reverse('api:group_posts', args=[self.group.slug])
+        )
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date(self.post.pub_date.timestamp()),
+        )
+        response = self.client.get(
+            reverse('api:group_posts', args=[self.group.slug]),
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_post_comments_and_profile(self):
+        """Комментарии и профиль меняют ETag своих ресурсов."""
+        reader = User.objects.create_user(username='reader')
+        comments = reverse('api:comments', args=[self.post.pk])
+        etag = self.client.get(comments)['ETag']
+        Comment.objects.create(text='Коммент', author=reader, post=self.post)
+        response = self.client.get(comments, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'][0]['text'], 'Коммент')
+        profile = reverse('api:profile', args=['auth'])
+        response = self.client.get(profile)
+        self.assertEqual(response.json()['followers_count'], 0)
+        Follow.objects.create(user=reader, author=self.author)
+        response = self.client.get(
+            profile, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.json()['followers_count'], 1)
+
+    def test_missing_objects_and_methods(self):
+        """Несуществующие объекты дают 404, запись в API запрещена."""
+        for url in (
+            reverse('api:post', args=[0]),
+            reverse('api:profile', args=['nobody']),
+            reverse('api:group_posts', args=['nothing']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+                )
+        self.assertEqual(
+            self.client.post(POSTS).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED,
+        )
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author) for i in range(5)
+        )
+        cls.ids = list(Post.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def test_staff_only(self):
+        """Выгрузка доступна только сотрудникам."""
+        url = reverse('api:export', args=['posts'])
+        client = Client()
+        client.force_login(self.author)
+        self.assertEqual(client.get(url).status_code, HTTPStatus.FOUND)
+        self.assertEqual(
+            self.client.get(reverse('api:export', args=['users'])).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_ndjson_resumes_after_id(self):
+        """NDJSON идет потоком и продолжается с id после after."""
+        response = self.client.get(
+            reverse('api:export', args=['posts']),
+            {'after': self.ids[1], 'until': self.ids[3]},
+        )
+        self.assertTrue(response.streaming)
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual([row['id'] for row in rows], self.ids[2:4])
+        self.assertEqual(rows[0]['author_id'], self.author.pk)
+
+    def test_csv(self):
+        """CSV начинается со строки заголовков."""
+        response = self.client.get(
+            reverse('api:export', args=['posts']), {'format': 'csv'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(
+            b''.join(response.streaming_content).decode()
+        )))
+        self.assertEqual(rows[0][:3], ['id', 'text', 'pub_date'])
+        self.assertEqual(len(rows), len(self.ids) + 1)
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_GET
+
+from posts import counters, export
+from posts.models import Group, Post, User
+from posts.paginator import KeysetPaginator
+
+from . import conditions, serializers
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+EXPORT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def json_response(data):
+    return JsonResponse(data, json_dumps_params=JSON_PARAMS)
+
+
+def page_response(request, queryset, serializer,
+                  ordering=('-pub_date', '-pk')):
+    paginator = KeysetPaginator(
+        queryset, settings.PAGE_SIZE, ordering=ordering
+    )
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+    return json_response(serializers.page(page_obj, serializer))
+
+
+def feed(queryset):
+    return queryset.select_related('author', 'group', 'counters')
+
+
+@require_GET
+@condition(conditions.posts_etag, conditions.posts_modified)
+def posts(request):
+    return page_response(request, feed(Post.objects.all()), serializers.post)
+
+
+@require_GET
+@condition(conditions.post_etag, conditions.post_modified)
+def post(request, post_id):
+    return json_response(serializers.post(
+        get_object_or_404(feed(Post.objects.all()), pk=post_id)
+    ))
+
+
+@require_GET
+@condition(conditions.post_etag, conditions.post_modified)
+def comments(request, post_id):
+    one_post = get_object_or_404(Post, pk=post_id)
+    return page_response(
+        request,
+        one_post.comments.select_related('author'),
+        serializers.comment,
+        ordering=('created', 'pk'),
+    )
+
+
+@require_GET
+@condition(conditions.groups_etag)
+def groups(request):
+    return json_response({'results': [
+        serializers.group(group) for group in Group.objects.order_by('pk')
+    ]})
+
+
+@require_GET
+@condition(conditions.group_posts_etag, conditions.group_posts_modified)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return page_response(
+        request, feed(group.group_list.all()), serializers.post
+    )
+
+
+@require_GET
+@condition(conditions.profile_etag)
+def profile(request, username):
+    user = get_object_or_404(User, username=username)
+    return json_response(
+        serializers.profile(user, counters.for_user(user))
+    )
+
+
+@require_GET
+@condition(conditions.profile_posts_etag, conditions.profile_posts_modified)
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return page_response(
+        request, feed(author.posts.all()), serializers.post
+    )
+
+
+@require_GET
+@staff_member_required
+def export_table(request, table):
+    """
+    Потоковая выгрузка таблицы для сотрудников: ?format=ndjson|csv,
+    ?after=<id> продолжает прерванную выгрузку, ?until=<id> ограничивает.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if table not in export.TABLES or export_format not in EXPORT_TYPES:
+        raise Http404('Нет такой выгрузки')
+    try:
+        bounds = {
+            name: int(request.GET[name])
+            for name in ('after', 'until') if name in request.GET
+        }
+    except ValueError:
+        return HttpResponseBadRequest('after и until должны быть id')
+    response = StreamingHttpResponse(
+        export.lines(table, export_format, **bounds),
+        content_type=EXPORT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{table}.{export_format}"'
+    )
+    return response
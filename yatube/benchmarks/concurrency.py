@@ -0,0 +1,155 @@
+"""
+Чтение под параллельной записью.
+
+Потоки-читатели запрашивают главную страницу через WSGI-приложение, как
+их передает многопоточный сервер: у каждого потока свое соединение с
+базой, транзакции фиксируются. Сначала замеряется одно чтение, затем то
+же чтение вместе с потоками, которые пишут комментарии. Кэш на время
+прогона отключается, чтобы каждое чтение шло в базу. В журнале WAL
+пропускная способность чтения не должна заметно падать; в журнале
+delete читатели ждут записи. Созданные комментарии удаляются.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts.models import Comment
+
+from .harness import WSGIRunner, percentile, scenarios, subjects
+
+MARKER = 'Комментарий из замера параллельной записи'
+READ_SCENARIOS = ('index', 'group_list', 'profile', 'post_detail')
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def journal_mode():
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0]
+
+
+class Worker(threading.Thread):
+    """Повторяет сценарий до события stop, считает ответы и ошибки."""
+
+    def __init__(self, runner, scenario, stop):
+        super().__init__(daemon=True)
+        self.runner = runner
+        self.scenario = scenario
+        self.stop = stop
+        self.done = 0
+        self.errors = 0
+        self.timings = []
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                started = time.perf_counter()
+                status, _ = self.runner.call(self.scenario)
+                self.timings.append(time.perf_counter() - started)
+                if status == self.scenario.status:
+                    self.done += 1
+                else:
+                    self.errors += 1
+        finally:
+            connection.close()
+
+
+def start(workers, duration):
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    workers[0].stop.set()
+    for worker in workers:
+        worker.join()
+
+
+def phase(runner, plan, readers, writers, duration):
+    stop = threading.Event()
+    comment = plan['add_comment POST']._replace(data={'text': MARKER})
+    workers = [
+        Worker(runner, plan['index'], stop) for _ in range(readers)
+    ] + [Worker(runner, comment, stop) for _ in range(writers)]
+    start(workers, duration)
+    reads, writes = workers[:readers], workers[readers:]
+    return {
+        'reads_per_s': round(sum(w.done for w in reads) / duration, 1),
+        'writes_per_s': round(sum(w.done for w in writes) / duration, 1),
+        'errors': sum(w.errors for w in workers),
+    }
+
+
+def run(readers=4, writers=2, duration=5.0, mode=None):
+    """
+    Результаты двух фаз, чтения без записи и с ней, и журнал SQLite,
+    в котором они получены. mode меняет journal_mode на время прогона.
+    """
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    if mode:
+        pragmas['journal_mode'] = mode
+    with override_settings(SQLITE_PRAGMAS=pragmas, CACHES=NO_CACHE):
+        # Новые соединения откроются уже с нужными прагмами
+        connection.close()
+        results = {
+            'journal_mode': (
+                journal_mode() if connection.vendor == 'sqlite' else None
+            ),
+        }
+        plan = {
+            scenario.name: scenario
+            for scenario in scenarios(**subjects())
+        }
+        runner = WSGIRunner()
+        try:
+            results['read'] = phase(runner, plan, readers, 0, duration)
+            results['read_write'] = phase(
+                runner, plan, readers, writers, duration
+            )
+        finally:
+            Comment.objects.filter(text=MARKER).delete()
+            connection.close()
+    return results
+
+
+def load(clients=(1, 8), duration=5.0, query_workers=None):
+    """
+    Задержка и пропускная способность страниц чтения при разном числе
+    одновременных клиентов. query_workers меняет
+    CONCURRENT_QUERY_WORKERS: 0 — запросы страницы идут по очереди.
+    """
+    overrides = {'CACHES': NO_CACHE}
+    if query_workers is not None:
+        overrides['CONCURRENT_QUERY_WORKERS'] = query_workers
+    results = {}
+    with override_settings(**overrides):
+        plan = {
+            scenario.name: scenario
+            for scenario in scenarios(**subjects())
+        }
+        runner = WSGIRunner()
+        try:
+            for count in clients:
+                stop = threading.Event()
+                workers = [
+                    Worker(
+                        runner,
+                        plan[READ_SCENARIOS[number % len(READ_SCENARIOS)]],
+                        stop,
+                    )
+                    for number in range(count)
+                ]
+                start(workers, duration)
+                timings = [t for worker in workers for t in worker.timings]
+                results[count] = {
+                    'requests_per_s': round(len(timings) / duration, 1),
+                    'p50': round(percentile(timings, 50) * 1000, 3),
+                    'p95': round(percentile(timings, 95) * 1000, 3),
+                    'errors': sum(worker.errors for worker in workers),
+                }
+        finally:
+            connection.close()
+    return results
@@ -0,0 +1,135 @@
+"""
+Генератор данных для замеров.
+
+Подписчики, заметки и комментарии распределены по степенному закону:
+немногие авторы собирают большую часть подписок и пишут большую часть
+заметок, как в живой соцсети. Данные создаются через bulk_create, минуя
+сигналы, поэтому счетчики и ленты подписок пересчитываются в конце.
+"""
+import io
+import random
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from posts import counters, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 5000
+IMAGES_COUNT = 8
+IMAGE_SIZE = (960, 540)
+
+
+def power_law(count, exponent, rnd):
+    """Веса 1 / rank ** exponent, розданные объектам в случайном порядке."""
+    weights = [1 / rank ** exponent for rank in range(1, count + 1)]
+    rnd.shuffle(weights)
+    return weights
+
+
+def make_images(prefix, rnd):
+    """Сохраняет несколько однотонных картинок, возвращает их имена."""
+    names = []
+    for number in range(IMAGES_COUNT):
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        content = io.BytesIO()
+        Image.new('RGB', IMAGE_SIZE, color).save(content, 'JPEG')
+        names.append(default_storage.save(
+            f'posts/{prefix}_{number}.jpg', ContentFile(content.getvalue())
+        ))
+    return names
+
+
+def batched(objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(users=1000, posts=20000, comments=20000, groups=20,
+             follows=20, images=0.2, exponent=1.2, seed=0,
+             prefix='bench'):
+    """
+    Заполняет базу и возвращает число созданных объектов по моделям.
+    При одинаковом seed порядок и связи данных повторяются.
+    """
+    rnd = random.Random(seed)
+    User.objects.bulk_create(
+        User(username=f'{prefix}{number}') for number in range(users)
+    )
+    user_ids = list(User.objects.filter(
+        username__startswith=prefix
+    ).order_by('pk').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        Group(
+            title=f'Сообщество {number}',
+            slug=f'{prefix}-{number}',
+            description='Сгенерировано для замеров',
+        )
+        for number in range(groups)
+    )
+    group_ids = list(Group.objects.filter(
+        slug__startswith=f'{prefix}-'
+    ).order_by('pk').values_list('pk', flat=True))
+    popularity = power_law(len(user_ids), exponent, rnd)
+    pairs = {
+        (user_id, author_id)
+        for user_id in user_ids
+        for author_id in rnd.choices(user_ids, popularity, k=follows)
+        if author_id != user_id
+    }
+    Follow.objects.bulk_create(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in sorted(pairs)
+    )
+    image_names = make_images(prefix, rnd) if images else []
+    activity = power_law(len(user_ids), exponent, rnd)
+    for batch in batched(
+        Post(
+            text=f'Заметка {number}',
+            author_id=author_id,
+            group_id=rnd.choice(group_ids + [None]) if group_ids else None,
+            image=(
+                rnd.choice(image_names)
+                if image_names and rnd.random() < images else ''
+            ),
+        )
+        for number, author_id in enumerate(
+            rnd.choices(user_ids, activity, k=posts)
+        )
+    ):
+        Post.objects.bulk_create(batch)
+    post_ids = list(Post.objects.filter(
+        author__username__startswith=prefix
+    ).order_by('pk').values_list('pk', flat=True))
+    if post_ids:
+        discussed = power_law(len(post_ids), exponent, rnd)
+        for batch in batched(
+            Comment(
+                text=f'Комментарий {number}',
+                author_id=rnd.choice(user_ids),
+                post_id=post_id,
+            )
+            for number, post_id in enumerate(
+                rnd.choices(post_ids, discussed, k=comments)
+            )
+        ):
+            Comment.objects.bulk_create(batch)
+    counters.recount_users()
+    counters.recount_posts()
+    if timeline.is_enabled():
+        for user in User.objects.filter(pk__in=user_ids).iterator():
+            timeline.rebuild(user)
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'follows': len(pairs),
+        'posts': len(post_ids),
+        'comments': comments if post_ids else 0,
+    }
@@ -0,0 +1,329 @@
+"""
+Прогон сценариев по адресам posts/urls.py.
+
+Каждый сценарий выполняется двумя способами: через django.test.Client и
+напрямую через WSGI-приложение проекта, с настоящими cookie сессии и
+CSRF. Для каждого сценария считаются перцентили времени ответа, число
+SQL-запросов на запрос и пик выделенной памяти (tracemalloc).
+"""
+import io
+import json
+import math
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from http import HTTPStatus
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from posts.models import Follow, Group, Post, User
+
+# Хост из ALLOWED_HOSTS, под которым идут запросы обоих способов
+HOST = '127.0.0.1'
+
+Scenario = namedtuple(
+    'Scenario', 'name method path data user status prepare'
+)
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def subjects():
+    """Пользователи, заметка и группа, на которых строятся сценарии."""
+    author = User.objects.order_by('-counters__followers_count').first()
+    post = (
+        Post.objects.filter(author=author).first() or Post.objects.first()
+    )
+    reader = User.objects.exclude(pk=author.pk).order_by(
+        '-counters__following_count'
+    ).first() if author else None
+    if post is None or reader is None:
+        raise BenchmarkError('В базе нет данных, используйте --generate')
+    target = User.objects.exclude(following__user=reader).exclude(
+        pk=reader.pk
+    ).first()
+    group = post.group or Group.objects.first()
+    if target is None or group is None:
+        raise BenchmarkError('Нужны группа и автор без подписки читателя')
+    return {
+        'post': post, 'group': group, 'reader': reader, 'target': target,
+    }
+
+
+def scenarios(post, group, reader, target):
+    """По сценарию на каждый адрес приложения posts и метод."""
+    def follow(remove):
+        def prepare():
+            if remove:
+                Follow.objects.filter(user=reader, author=target).delete()
+            else:
+                Follow.objects.get_or_create(user=reader, author=target)
+        return prepare
+
+    def url(name, *args):
+        return reverse(f'posts:{name}', args=args)
+
+    editor = post.author
+    search = url('search') + '?' + urlencode({'q': post.text.split()[0]})
+    found, redirect = HTTPStatus.OK, HTTPStatus.FOUND
+    return [
+        Scenario('index', 'GET', url('index'), None, None, found, None),
+        Scenario('index ?page=2', 'GET', url('index') + '?page=2', None,
+                 None, found, None),
+        Scenario('group_list', 'GET', url('group_list', group.slug), None,
+                 None, found, None),
+        Scenario('profile', 'GET', url('profile', editor.username), None,
+                 reader, found, None),
+        Scenario('post_detail', 'GET', url('post_detail', post.pk), None,
+                 None, found, None),
+        Scenario('post_comments', 'GET', url('post_comments', post.pk),
+                 None, None, found, None),
+        Scenario('search', 'GET', search, None, None, found, None),
+        Scenario('post_create', 'GET', url('post_create'), None, reader,
+                 found, None),
+        Scenario('post_create POST', 'POST', url('post_create'),
+                 {'text': 'Заметка из замера', 'group': group.pk}, reader,
+                 redirect, None),
+        Scenario('post_edit', 'GET', url('post_edit', post.pk), None,
+                 editor, found, None),
+        Scenario('post_edit POST', 'POST', url('post_edit', post.pk),
+                 {'text': post.text, 'group': group.pk}, editor, redirect,
+                 None),
+        Scenario('add_comment POST', 'POST', url('add_comment', post.pk),
+                 {'text': 'Комментарий из замера'}, reader, redirect, None),
+        Scenario('follow_index', 'GET', url('follow_index'), None, reader,
+                 found, None),
+        Scenario('profile_follow', 'GET',
+                 url('profile_follow', target.username), None, reader,
+                 redirect, follow(remove=True)),
+        Scenario('profile_unfollow', 'GET',
+                 url('profile_unfollow', target.username), None, reader,
+                 redirect, follow(remove=False)),
+    ]
+
+
+class ClientRunner:
+    """Запросы через тестовый клиент Django."""
+    name = 'client'
+
+    def __init__(self):
+        self.clients = {}
+
+    def client(self, user):
+        if user not in self.clients:
+            self.clients[user] = Client(HTTP_HOST=HOST)
+            if user is not None:
+                self.clients[user].force_login(user)
+        return self.clients[user]
+
+    def request(self, scenario):
+        client = self.client(scenario.user)
+        if scenario.method == 'POST':
+            response = client.post(scenario.path, scenario.data)
+        else:
+            response = client.get(scenario.path)
+        return response.status_code, len(response.content)
+
+
+class WSGIRunner:
+    """Запросы прямо в WSGI-приложение, как их передает сервер."""
+    name = 'wsgi'
+
+    def __init__(self):
+        self.application = get_wsgi_application()
+        self.csrf_token = get_random_string(64)
+        self.cookies = {}
+
+    def cookie(self, user):
+        if user not in self.cookies:
+            cookies = {settings.CSRF_COOKIE_NAME: self.csrf_token}
+            if user is not None:
+                client = Client()
+                client.force_login(user)
+                cookies[settings.SESSION_COOKIE_NAME] = client.cookies[
+                    settings.SESSION_COOKIE_NAME
+                ].value
+            self.cookies[user] = '; '.join(
+                f'{name}={value}' for name, value in cookies.items()
+            )
+        return self.cookies[user]
+
+    def environ(self, scenario):
+        url = urlsplit(scenario.path)
+        data = dict(scenario.data or {})
+        if scenario.method == 'POST':
+            data['csrfmiddlewaretoken'] = self.csrf_token
+        body = urlencode(data).encode()
+        return {
+            'REQUEST_METHOD': scenario.method,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': HOST,
+            'HTTP_COOKIE': self.cookie(scenario.user),
+            'REMOTE_ADDR': HOST,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+
+    def call(self, scenario):
+        status = []
+
+        def start_response(line, headers, exc_info=None):
+            status.append(int(line.split()[0]))
+
+        result = self.application(self.environ(scenario), start_response)
+        try:
+            size = sum(len(chunk) for chunk in result)
+        finally:
+            result.close()
+        return status[0], size
+
+    def request(self, scenario):
+        # Как и тестовый клиент, не даем обработчику закрыть соединение:
+        # прогон идет внутри транзакции (см. isolated)
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            return self.call(scenario)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+
+RUNNERS = {runner.name: runner for runner in (ClientRunner, WSGIRunner)}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def measure(runner, scenario, requests):
+    """Первый запрос идет в пустой кэш, остальные попадают в него."""
+    cache.clear()
+    timings, queries = [], []
+    for _ in range(requests):
+        if scenario.prepare:
+            scenario.prepare()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            status, size = runner.request(scenario)
+            timings.append(time.perf_counter() - started)
+        if status != scenario.status:
+            raise BenchmarkError(
+                f'{scenario.name}: ответ {status}, ожидался '
+                f'{scenario.status}'
+            )
+        queries.append(counter.count)
+    # Память меряется отдельным запросом: tracemalloc замедляет ответы
+    if scenario.prepare:
+        scenario.prepare()
+    tracemalloc.start()
+    try:
+        runner.request(scenario)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50': round(percentile(timings, 50) * 1000, 3),
+        'p95': round(percentile(timings, 95) * 1000, 3),
+        'p99': round(percentile(timings, 99) * 1000, 3),
+        'queries': percentile(queries, 50),
+        'queries_max': max(queries),
+        'memory_kib': round(peak / 1024, 1),
+        'bytes': size,
+    }
+
+
+@contextmanager
+def isolated():
+    """Сценарии с POST меняют базу: прогон идет в откатываемой транзакции."""
+    try:
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+    finally:
+        cache.clear()
+
+
+def run(runner_names, requests):
+    """Результаты вида {runner: {scenario: метрики}}."""
+    results = {}
+    with isolated():
+        plan = scenarios(**subjects())
+        for runner_name in runner_names:
+            runner = RUNNERS[runner_name]()
+            results[runner_name] = {
+                scenario.name: measure(runner, scenario, requests)
+                for scenario in plan
+            }
+    return results
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(results, path):
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump(results, baseline, ensure_ascii=False, indent=2)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Регрессии относительно базовой линии: рост p50 и p95 сверх tolerance
+    и любой рост числа запросов. p99 при десятках запросов на сценарий
+    равен худшему из них, поэтому только выводится.
+    """
+    regressions = []
+    for runner_name, measured in results.items():
+        for name, metrics in measured.items():
+            base = baseline.get(runner_name, {}).get(name)
+            if base is None:
+                continue
+            for metric in ('p50', 'p95'):
+                if metrics[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(
+                        f'{runner_name} {name} {metric}: '
+                        f'{base[metric]} -> {metrics[metric]} ms'
+                    )
+            for metric in ('queries', 'queries_max'):
+                if metrics[metric] > base[metric]:
+                    regressions.append(
+                        f'{runner_name} {name} {metric}: '
+                        f'{base[metric]} -> {metrics[metric]}'
+                    )
+    return regressions
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import generator, harness
+
+COLUMNS = ('p50', 'p95', 'p99', 'queries', 'queries_max', 'memory_kib')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет адреса приложения posts через тестовый клиент и WSGI: '
+        'перцентили времени ответа (ms), SQL-запросы на запрос и пик '
+        'памяти. Изменения базы во время прогона откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--generate', action='store_true',
+            help='Сначала заполнить базу данными для замеров',
+        )
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора данных',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на сценарий',
+        )
+        parser.add_argument(
+            '--runner', action='append', choices=sorted(harness.RUNNERS),
+            help='Способ выполнения запросов, по умолчанию оба',
+        )
+        parser.add_argument(
+            '--baseline', help='Сравнить с сохраненной базовой линией',
+        )
+        parser.add_argument(
+            '--save-baseline', help='Сохранить результаты в файл',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост времени ответа, доля от базовой линии',
+        )
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            created = generator.generate(
+                users=options['users'],
+                posts=options['posts'],
+                comments=options['comments'],
+                seed=options['seed'],
+            )
+            self.stdout.write(', '.join(
+                f'{name}: {count}' for name, count in created.items()
+            ))
+        try:
+            results = harness.run(
+                options['runner'] or sorted(harness.RUNNERS),
+                options['requests'],
+            )
+        except harness.BenchmarkError as error:
+            raise CommandError(error)
+        self.report(results)
+        if options['save_baseline']:
+            harness.save_baseline(results, options['save_baseline'])
+        if options['baseline']:
+            regressions = harness.compare(
+                results,
+                harness.load_baseline(options['baseline']),
+                options['tolerance'],
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def report(self, results):
+        for runner_name, measured in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(runner_name))
+            self.stdout.write(
+                f'{"":<20}' + ''.join(f'{column:>12}' for column in COLUMNS)
+            )
+            for name, metrics in measured.items():
+                self.stdout.write(f'{name:<20}' + ''.join(
+                    f'{metrics[column]:>12}' for column in COLUMNS
+                ))
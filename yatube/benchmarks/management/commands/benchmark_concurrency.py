@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import concurrency, harness
+
+COLUMNS = ('reads_per_s', 'writes_per_s', 'errors')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность чтения главной страницы без '
+        'записи и вместе с потоками, добавляющими комментарии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на каждую фазу',
+        )
+        parser.add_argument(
+            '--journal-mode', choices=('wal', 'delete'),
+            help='Журнал SQLite на время прогона, по умолчанию из настроек',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = concurrency.run(
+                readers=options['readers'],
+                writers=options['writers'],
+                duration=options['duration'],
+                mode=options['journal_mode'],
+            )
+        except harness.BenchmarkError as error:
+            raise CommandError(error)
+        self.stdout.write(f'journal_mode: {results["journal_mode"]}')
+        self.stdout.write(
+            f'{"":<12}' + ''.join(f'{column:>14}' for column in COLUMNS)
+        )
+        for name in ('read', 'read_write'):
+            self.stdout.write(f'{name:<12}' + ''.join(
+                f'{results[name][column]:>14}' for column in COLUMNS
+            ))
+        read, mixed = results['read'], results['read_write']
+        if read['reads_per_s']:
+            share = mixed['reads_per_s'] / read['reads_per_s']
+            self.stdout.write(f'Чтение под записью: {share:.0%} от чистого')
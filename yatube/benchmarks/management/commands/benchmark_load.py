@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import concurrency, harness
+
+COLUMNS = ('requests_per_s', 'p50', 'p95', 'errors')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает главную, группу, профиль и заметку через WSGI '
+        'несколькими одновременными клиентами и выводит пропускную '
+        'способность и задержку (ms) для каждого их числа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients', type=int, action='append',
+            help='Число одновременных клиентов, можно несколько раз',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на каждое число клиентов',
+        )
+        parser.add_argument(
+            '--query-workers', type=int,
+            help='CONCURRENT_QUERY_WORKERS на время прогона',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = concurrency.load(
+                clients=options['clients'] or (1, 4, 16),
+                duration=options['duration'],
+                query_workers=options['query_workers'],
+            )
+        except harness.BenchmarkError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            f'{"clients":<10}' + ''.join(f'{c:>16}' for c in COLUMNS)
+        )
+        for clients, metrics in results.items():
+            self.stdout.write(f'{clients:<10}' + ''.join(
+                f'{metrics[column]:>16}' for column in COLUMNS
+            ))
@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import resolve
+
+from posts.models import Comment, Follow, Post, UserCounters
+from posts.urls import urlpatterns
+
+from . import generator, harness
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        generator.generate(users=30, posts=60, comments=60, groups=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generated_followers_follow_power_law(self):
+        """Подписчики сосредоточены у немногих авторов."""
+        followers = sorted(UserCounters.objects.values_list(
+            'followers_count', flat=True
+        ), reverse=True)
+        self.assertGreater(followers[0], followers[len(followers) // 2] * 3)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    def test_scenarios_cover_posts_urls(self):
+        """Сценарии покрывают все адреса posts/urls.py."""
+        plan = harness.scenarios(**harness.subjects())
+        self.assertEqual(
+            {resolve(scenario.path.split('?')[0]).url_name
+             for scenario in plan},
+            {pattern.name for pattern in urlpatterns},
+        )
+
+    def test_run_measures_and_rolls_back(self):
+        """Оба способа прогона дают метрики, изменения базы откатываются."""
+        before = (
+            Post.objects.count(), Comment.objects.count(),
+            Follow.objects.count(),
+        )
+        results = harness.run(sorted(harness.RUNNERS), requests=2)
+        self.assertEqual(set(results), {'client', 'wsgi'})
+        for measured in results.values():
+            # Первый запрос собирает страницу, остальные берут ее из кэша
+            self.assertEqual(measured['index']['queries_max'], 1)
+            self.assertEqual(measured['index']['queries'], 0)
+            self.assertGreater(measured['post_detail']['p50'], 0)
+        self.assertEqual(
+            before,
+            (Post.objects.count(), Comment.objects.count(),
+             Follow.objects.count()),
+        )
+
+    def test_compare_reports_regressions(self):
+        """Сравнение замечает рост времени и числа запросов."""
+        base = {'p50': 1, 'p95': 2, 'p99': 3, 'queries': 2,
+                'queries_max': 3}
+        slower = dict(base, p50=2, queries_max=4)
+        regressions = harness.compare(
+            {'wsgi': {'index': slower}}, {'wsgi': {'index': base}}, 0.2
+        )
+        self.assertEqual(len(regressions), 2)
+        self.assertEqual(harness.compare(
+            {'wsgi': {'index': base}}, {'wsgi': {'index': base}}, 0.2
+        ), [])
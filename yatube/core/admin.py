@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'name', 'status', 'priority', 'attempts', 'run_at', 'created',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('key', 'error')
@@ -0,0 +1,160 @@
+"""
+Файловый кэш с вытеснением давно не читанных записей.
+
+Каталог кэша общий для всех процессов сервера, поэтому фрагменты
+{% cache %} и версии лент считаются один раз и одинаковы во всех
+воркерах. Запись атомарна уже в FileBasedCache: значение пишется во
+временный файл, который затем переименовывается.
+"""
+import json
+import os
+import threading
+from collections import Counter
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+STATS_FILE = 'stats.json'
+COUNTERS = ('hits', 'misses', 'evictions')
+
+# Кэши создаются для каждого потока, счетчики общие для процесса
+_pending = {}
+_lock = threading.Lock()
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    В отличие от FileBasedCache:
+    - чтение обновляет mtime файла, и при переполнении удаляются давно
+      не читанные записи, а не случайные;
+    - кроме числа записей (MAX_ENTRIES) ограничивается общий размер
+      файлов в байтах (OPTIONS['MAX_SIZE']);
+    - переполнение проверяется раз в OPTIONS['CULL_EVERY'] записей:
+      проверка обходит весь каталог;
+    - попадания, промахи и вытеснения копятся в процессе и раз в
+      OPTIONS['STATS_FLUSH'] событий добавляются в stats.json каталога.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get('OPTIONS', {})
+        self._max_size = int(options.get('MAX_SIZE', 0))
+        self._cull_every = int(options.get('CULL_EVERY', 1))
+        self._stats_flush = int(options.get('STATS_FLUSH', 100))
+        self._writes = 0
+
+    def get(self, key, default=None, version=None):
+        fname = self._key_to_file(key, version)
+        missing = object()
+        value = super().get(key, missing, version)
+        if value is missing:
+            self._count('misses')
+            return default
+        self._count('hits')
+        try:
+            os.utime(fname)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._writes += 1
+        super().set(key, value, timeout, version)
+
+    def _entries(self):
+        """Файлы кэша как (mtime, размер, путь)."""
+        entries = []
+        for fname in self._list_cache_files():
+            try:
+                stat = os.stat(fname)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fname))
+        return entries
+
+    def _limit(self, value, maximum):
+        # Как и FileBasedCache, переполнение освобождает долю
+        # 1 / CULL_FREQUENCY, чтобы не вытеснять на каждой записи
+        if maximum and value >= maximum:
+            return maximum - maximum // self._cull_frequency
+        return value
+
+    def _cull(self):
+        if self._writes % self._cull_every:
+            return
+        entries = self._entries()
+        count = len(entries)
+        size = sum(entry[1] for entry in entries)
+        if count < self._max_entries and (
+            not self._max_size or size < self._max_size
+        ):
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+        max_count = self._limit(count, self._max_entries)
+        max_size = self._limit(size, self._max_size)
+        for _, entry_size, fname in sorted(entries):
+            if count <= max_count and size <= max_size:
+                break
+            self._delete(fname)
+            count -= 1
+            size -= entry_size
+            self._count('evictions')
+
+    def _count(self, name):
+        with _lock:
+            pending = _pending.setdefault(self._dir, Counter())
+            pending[name] += 1
+            if sum(pending.values()) < self._stats_flush:
+                return
+            _pending[self._dir] = Counter()
+        self._flush(pending)
+
+    def _flush(self, pending):
+        """Добавляет счетчики процесса в stats.json под блокировкой."""
+        self._createdir()
+        path = os.path.join(self._dir, STATS_FILE)
+        with open(path, 'a+', encoding='utf-8') as stats:
+            locks.lock(stats, locks.LOCK_EX)
+            try:
+                stats.seek(0)
+                saved = Counter(json.loads(stats.read() or '{}'))
+                saved.update(pending)
+                stats.seek(0)
+                stats.truncate()
+                stats.write(json.dumps(saved))
+            finally:
+                locks.unlock(stats)
+
+    def stats(self):
+        """Записи и байты на диске, счетчики всех процессов."""
+        with _lock:
+            pending = _pending.pop(self._dir, Counter())
+        if pending:
+            self._flush(pending)
+        try:
+            with open(os.path.join(self._dir, STATS_FILE),
+                      encoding='utf-8') as stats:
+                counters = json.load(stats)
+        except (FileNotFoundError, ValueError):
+            counters = {}
+        entries = self._entries()
+        result = {name: counters.get(name, 0) for name in COUNTERS}
+        lookups = result['hits'] + result['misses']
+        result.update({
+            'hit_ratio': result['hits'] / lookups if lookups else 0.0,
+            'entries': len(entries),
+            'bytes': sum(entry[1] for entry in entries),
+            'max_entries': self._max_entries,
+            'max_size': self._max_size,
+        })
+        return result
+
+    def reset_stats(self):
+        with _lock:
+            _pending.pop(self._dir, None)
+        try:
+            os.remove(os.path.join(self._dir, STATS_FILE))
+        except FileNotFoundError:
+            pass
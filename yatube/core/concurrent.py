@@ -0,0 +1,60 @@
+"""
+Параллельные независимые запросы к базе в рамках одного HTTP-запроса.
+
+Django 2.2 не умеет асинхронных view, поэтому страница, которой нужны
+несколько независимых выборок, отдает их пулу потоков: у каждого потока
+свое соединение, и ожидание базы перекрывается. Потоки получают копию
+контекста запроса (закрепление за основной базой из core.routers) и
+пишут свои SQL в метрики запроса.
+
+Внутри транзакции другие соединения не видят ее незафиксированных
+изменений, поэтому там, как и при CONCURRENT_QUERY_WORKERS = 0,
+функции выполняются по очереди в текущем потоке.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+from . import metrics
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.CONCURRENT_QUERY_WORKERS,
+                thread_name_prefix='queries',
+            )
+    return _executor
+
+
+def _call(function):
+    # Соединения потоков пула живут, как соединения воркеров сервера
+    close_old_connections()
+    current = metrics.current()
+    with ExitStack() as stack:
+        if current is not None:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(current)
+                )
+        return function()
+
+
+def gather(*functions):
+    """Результаты функций в том же порядке; исключения пробрасываются."""
+    if not settings.CONCURRENT_QUERY_WORKERS or connection.in_atomic_block:
+        return [function() for function in functions]
+    futures = [
+        _pool().submit(contextvars.copy_context().run, _call, function)
+        for function in functions
+    ]
+    return [future.result() for future in futures]
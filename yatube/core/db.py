@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """
+    Проверка постоянных соединений перед запросом: оборванное сервером
+    или пулом соединение закрывается, и Django откроет новое, вместо
+    ошибки посреди запроса.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict['CONN_MAX_AGE']
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Прагмы settings.SQLITE_PRAGMAS для каждого нового соединения с SQLite.
+    Выполняются мимо курсоров Django, чтобы не попадать в метрики запроса.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
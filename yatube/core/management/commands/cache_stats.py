@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Показывает заполнение и счетчики общего кэша (core.cache)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счетчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'stats'):
+            raise CommandError(
+                'Кэш по умолчанию не ведет статистику, '
+                'нужен core.cache.LRUFileBasedCache'
+            )
+        stats = cache.stats()
+        self.stdout.write(
+            'entries: {entries} / {max_entries}\n'
+            'bytes: {bytes} / {max_size}\n'
+            'hits: {hits}\nmisses: {misses}\nevictions: {evictions}\n'
+            'hit ratio: {hit_ratio:.2%}'.format(**stats)
+        )
+        if options['reset']:
+            cache.reset_stats()
@@ -0,0 +1,51 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе (core.tasks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Число процессов-воркеров',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выполнить накопившиеся задачи и выйти',
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Показать число задач по состояниям и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for status, count in tasks.stats().items():
+                self.stdout.write(f'{status}: {count}')
+            return
+        if options['burst']:
+            done = tasks.run_pending()
+            self.stdout.write(f'Выполнено задач: {done}')
+            return
+        if options['processes'] == 1:
+            tasks.work()
+            return
+        # Соединения с базой не должны достаться дочерним процессам
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=tasks.work, daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
@@ -0,0 +1,87 @@
+"""
+Метрики текущего запроса.
+
+RequestMetricsMiddleware создает RequestMetrics на время запроса; SQL
+считается через connection.execute_wrapper, время шаблонов отмечает
+бэкенд core.template_backend, попадания в кэш передаются через
+count_cache, загрузки файлов — через count_upload. Вне запроса
+(команды, тесты) учет ничего не делает.
+"""
+import time
+from contextvars import ContextVar
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.upload_time = 0.0
+        self.upload_bytes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.sql_time += duration
+            self.queries.append((sql, duration))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def count_cache(hit):
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def count_upload(duration, size=0):
+    """Время приема или проверки загруженного файла и его размер."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.upload_time += duration
+        metrics.upload_bytes += size
+
+
+class template_timer:
+    """Время рендера; вложенные рендеры входят во внешний."""
+
+    def __enter__(self):
+        self.metrics = _current.get()
+        if self.metrics is not None:
+            self.metrics.template_depth += 1
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.metrics is None:
+            return
+        self.metrics.template_depth -= 1
+        if not self.metrics.template_depth:
+            self.metrics.template_time += time.perf_counter() - self.started
@@ -0,0 +1,116 @@
+import json
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger('core.requests')
+
+PIN_COOKIE = 'primary_pin'
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestMetricsMiddleware:
+    """
+    Метрики запроса: view, число и время SQL-запросов, время шаблонов,
+    попадания в кэш, время и объем загрузок и размер ответа. Пишутся
+    строкой JSON в лог core.requests и в заголовок Server-Timing.
+    Медленные запросы (REQUEST_METRICS_SLOW_MS) с вероятностью
+    REQUEST_METRICS_SLOW_SAMPLE логируются как warning вместе со списком
+    SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current, token = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(current))
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        record = self.record(request, response, current)
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = self.server_timing(record)
+        self.log(record, current)
+        return response
+
+    def record(self, request, response, current):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': _ms(current.elapsed),
+            'queries': len(current.queries),
+            'sql_ms': _ms(current.sql_time),
+            'template_ms': _ms(current.template_time),
+            'cache_hits': current.cache_hits,
+            'cache_misses': current.cache_misses,
+            'upload_ms': _ms(current.upload_time),
+            'upload_bytes': current.upload_bytes,
+            'size': None if response.streaming else len(response.content),
+        }
+
+    def server_timing(self, record):
+        parts = [
+            f'sql;dur={record["sql_ms"]};desc="{record["queries"]} queries"',
+            f'tpl;dur={record["template_ms"]}',
+            f'cache;desc="hits {record["cache_hits"]}, '
+            f'misses {record["cache_misses"]}"',
+        ]
+        if record['upload_bytes']:
+            parts.append(
+                f'upload;dur={record["upload_ms"]};'
+                f'desc="{record["upload_bytes"]} bytes"'
+            )
+        parts.append(f'total;dur={record["duration_ms"]}')
+        return ', '.join(parts)
+
+    def log(self, record, current):
+        if (
+            record['duration_ms'] >= settings.REQUEST_METRICS_SLOW_MS
+            and random.random() < settings.REQUEST_METRICS_SLOW_SAMPLE
+        ):
+            record['sql'] = [
+                {'sql': sql, 'ms': _ms(duration)}
+                for sql, duration in current.queries
+            ]
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+class PrimaryPinMiddleware:
+    """
+    Закрепляет чтение за основной базой на REPLICA_PIN_SECONDS после
+    запроса, который в нее писал, чтобы пользователь видел свои изменения
+    до того, как их получат реплики.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        if PIN_COOKIE in request.COOKIES:
+            routers.pin()
+        response = self.get_response(request)
+        if settings.REPLICA_DATABASES and routers.written():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
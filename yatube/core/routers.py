@@ -0,0 +1,58 @@
+"""
+Маршрутизация запросов к базе: запись в основную базу, чтение лент
+(приложение posts) — с реплик из settings.REPLICA_DATABASES.
+
+Чтобы пользователь сразу видел свои изменения, после записи чтение
+закрепляется за основной базой до конца запроса, а PrimaryPinMiddleware
+продлевает закрепление cookie на REPLICA_PIN_SECONDS, пока реплики
+догоняют основную базу.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+REPLICA_APPS = {'posts'}
+
+_pinned = ContextVar('primary_pinned', default=False)
+_written = ContextVar('primary_written', default=False)
+
+
+def pin():
+    _pinned.set(True)
+
+
+def reset():
+    _pinned.set(False)
+    _written.set(False)
+
+
+def written():
+    return _written.get()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if (
+            not replicas
+            or model._meta.app_label not in REPLICA_APPS
+            or _pinned.get()
+            or transaction.get_connection().in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in REPLICA_APPS:
+            _pinned.set(True)
+            _written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -0,0 +1,86 @@
+"""
+Хранилище файлов с адресацией по содержимому.
+
+Имя файла — SHA-256 загруженных байтов в каталоге upload_to:
+posts/3f/3fa4….jpg. Повторная загрузка тех же байтов получает то же имя
+и ничего не пишет на диск, а все, что привязано к имени (миниатюры),
+общее у одинаковых картинок. Фоновая обработка может
+переписать файл на месте (posts.thumbnails): имя остается хэшем
+загруженных байтов, и повторная загрузка находит обработанный файл.
+Удалять файл можно, только
+когда на него не ссылается ни одна запись (posts.media).
+
+Повторная загрузка увеличивает время изменения файла (version), а
+запись и удаление идут под блокировкой имени (lock): удаляющий видит,
+что файл снова загружен, даже если заметка с ним еще не сохранена.
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: блокировка только между потоками одного процесса
+    fcntl = None
+
+CHUNK_SIZE = 64 * 2 ** 10
+# Блокировки по первым двум символам хэша имени: файлов блокировок не
+# больше 256
+LOCKS_DIR = '.locks'
+_thread_lock = threading.Lock()
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя задает содержимое, одинаковые имена — один и тот же файл
+        return name
+
+    @contextmanager
+    def lock(self, name):
+        """Блокировка имени между потоками и процессами."""
+        stripe = hashlib.md5(name.encode()).hexdigest()[:2]
+        path = os.path.join(self.location, LOCKS_DIR, f'{stripe}.lock')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _thread_lock, open(path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def version(self, name):
+        """Время изменения файла в нс; None, если файла нет."""
+        try:
+            return os.stat(self.path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def touch(self, name):
+        # Часы файловой системы грубые: версия растет строго, даже если
+        # две загрузки пришлись на один их тик
+        stamp = max(time.time_ns(), self.version(name) + 1)
+        os.utime(self.path(name), ns=(stamp, stamp))
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        name = os.path.join(directory, digest[:2], digest + extension)
+        with self.lock(name):
+            if self.version(name) is None:
+                return super()._save(name, content)
+            # Файл уже есть: отметка для posts.media, что он снова нужен
+            self.touch(name)
+            return name
@@ -0,0 +1,261 @@
+"""
+Очередь фоновых задач в базе данных, без отдельного брокера.
+
+Задача — функция с декоратором @task; вызов .delay(*args) добавляет в
+таблицу core.Task строку с именем функции и аргументами в JSON. Строка
+пишется в той же транзакции, что и изменения запроса, поэтому задача
+появляется в очереди только вместе с ними. Воркеры (manage.py
+run_tasks, один или несколько процессов) забирают задачи по приоритету
+и времени, каждую выполняют в транзакции (если не atomic=False):
+- выполненная задача удаляется;
+- упавшая ставится на повтор через TASKS_RETRY_DELAY секунд, с каждой
+  попыткой вдвое дольше, после max_attempts попыток остается со
+  статусом failed и текстом ошибки;
+- задача упавшего воркера через TASKS_LEASE секунд достается другому,
+  а после max_attempts попыток тоже остается со статусом failed. Долгие
+  задачи продлевают срок вызовом heartbeat().
+
+С ключом идемпотентности (key) повторная постановка ничего не делает,
+пока задача с тем же ключом не выполнена. При TASKS_EAGER (по умолчанию
+только в тестах) задачи выполняются без очереди, в том же потоке, после
+фиксации транзакции, которая их поставила.
+"""
+import functools
+import json
+import logging
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+HIGH = 10
+NORMAL = 0
+LOW = -10
+CLAIM_BATCH = 10
+
+# Задача, которую сейчас выполняет воркер: для heartbeat()
+current_task = ContextVar('current_task', default=None)
+
+
+class LeaseLost(Exception):
+    """Срок задачи истек, и ее забрал другой воркер."""
+
+
+class TaskFunction:
+    def __init__(self, function, priority, max_attempts, atomic):
+        functools.update_wrapper(self, function)
+        self.function = function
+        self.name = f'{function.__module__}.{function.__name__}'
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.atomic = atomic
+
+    def __call__(self, *args):
+        return self.function(*args)
+
+    def delay(self, *args, key=None, priority=None, countdown=0):
+        """
+        Ставит задачу в очередь; аргументы должны сериализоваться в JSON.
+        Возвращает Task или None, если задача выполняется без очереди
+        (TASKS_EAGER) или такая уже ждет в очереди.
+        """
+        if settings.TASKS_EAGER:
+            run_eager(self, args)
+            return None
+        try:
+            with transaction.atomic():
+                return Task.objects.create(
+                    name=self.name,
+                    args=json.dumps(args),
+                    key=key,
+                    priority=self.priority if priority is None else priority,
+                    max_attempts=(
+                        self.max_attempts or settings.TASKS_MAX_ATTEMPTS
+                    ),
+                    run_at=timezone.now() + timedelta(seconds=countdown),
+                )
+        except IntegrityError:
+            return None
+
+
+def task(priority=NORMAL, max_attempts=None, atomic=True):
+    """
+    Декоратор фоновой задачи: @task(priority=HIGH). Задачи с atomic=False
+    выполняются без общей транзакции: так делают задачи, которые сами
+    фиксируют свой ход и при повторе продолжают с места ошибки.
+    """
+    def decorator(function):
+        return TaskFunction(function, priority, max_attempts, atomic)
+    return decorator
+
+
+def _transaction(task_function):
+    return transaction.atomic() if task_function.atomic else nullcontext()
+
+
+def _call(task_function, args):
+    """Выполняет задачу; возвращает длительность в миллисекундах."""
+    started = time.perf_counter()
+    with _transaction(task_function):
+        task_function(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def run_eager(task_function, args):
+    """
+    Выполняет задачу после фиксации текущей транзакции, как воркер: при
+    откате запроса задача не выполняется, а ее ошибка запрос не ломает.
+    """
+    def run():
+        try:
+            duration = _call(task_function, args)
+        except Exception:
+            logger.exception('Задача %s%r не выполнена', task_function.name,
+                             args)
+            return
+        logger.info('Задача %s%r: %.0f мс', task_function.name, args,
+                    duration)
+    transaction.on_commit(run)
+
+
+def _abandoned(now):
+    return Q(status=Task.RUNNING, locked_until__lt=now)
+
+
+def _available(now):
+    return Q(status=Task.QUEUED, run_at__lte=now) | (
+        _abandoned(now) & Q(attempts__lt=F('max_attempts'))
+    )
+
+
+def claim():
+    """
+    Забирает следующую задачу. Строка помечается одним UPDATE с тем же
+    условием, что и при выборе, так что два воркера одну задачу не
+    получат ни на одной базе. Брошенные задачи без оставшихся попыток
+    (например, каждый раз убивающие воркер) помечаются failed.
+    """
+    now = timezone.now()
+    Task.objects.filter(
+        _abandoned(now), attempts__gte=F('max_attempts')
+    ).update(
+        status=Task.FAILED, key=None, locked_until=None,
+        error='Воркер не завершил задачу за TASKS_LEASE',
+    )
+    candidates = Task.objects.filter(_available(now)).order_by(
+        '-priority', 'run_at', 'pk'
+    ).values_list('pk', flat=True)[:CLAIM_BATCH]
+    for pk in candidates:
+        claimed = Task.objects.filter(_available(now), pk=pk).update(
+            status=Task.RUNNING,
+            locked_until=now + timedelta(seconds=settings.TASKS_LEASE),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def heartbeat():
+    """
+    Продлевает срок выполняемой задачи еще на TASKS_LEASE секунд; вне
+    воркера ничего не делает. Если задачу уже забрал другой воркер,
+    бросает LeaseLost: продолжать ее нельзя. Продление видно другим
+    воркерам сразу только в задачах с atomic=False.
+    """
+    task = current_task.get()
+    if task is None:
+        return
+    extended = Task.objects.filter(
+        pk=task.pk, status=Task.RUNNING, attempts=task.attempts
+    ).update(
+        locked_until=timezone.now() + timedelta(seconds=settings.TASKS_LEASE)
+    )
+    if not extended:
+        raise LeaseLost(task.pk)
+
+
+def retry_delay(attempts):
+    return settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def fail(task, error):
+    tasks = Task.objects.filter(pk=task.pk)
+    if task.attempts < task.max_attempts:
+        tasks.update(
+            status=Task.QUEUED,
+            locked_until=None,
+            run_at=timezone.now() + timedelta(
+                seconds=retry_delay(task.attempts)
+            ),
+            error=repr(error),
+        )
+    else:
+        # Ключ освобождается: такую задачу можно поставить снова
+        tasks.update(status=Task.FAILED, key=None, error=repr(error))
+
+
+def execute(task):
+    token = current_task.set(task)
+    try:
+        duration = _call(import_string(task.name), json.loads(task.args))
+    except LeaseLost:
+        # Задача уже у другого воркера: ее строку трогать нельзя
+        logger.warning('Задача %s #%s забрана другим воркером', task.name,
+                       task.pk)
+        return False
+    except Exception as error:
+        logger.exception('Задача %s #%s, попытка %s', task.name, task.pk,
+                         task.attempts)
+        fail(task, error)
+        return False
+    finally:
+        current_task.reset(token)
+    Task.objects.filter(pk=task.pk).delete()
+    logger.info('Задача %s #%s: %.0f мс', task.name, task.pk, duration)
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет задачи, готовые к запуску; возвращает их число."""
+    done = 0
+    while limit is None or done < limit:
+        task = claim()
+        if task is None:
+            break
+        execute(task)
+        done += 1
+    return done
+
+
+def work(poll_interval=None):
+    """Цикл воркера: задачи по одной, при пустой очереди — ожидание."""
+    poll_interval = poll_interval or settings.TASKS_POLL_INTERVAL
+    while True:
+        close_old_connections()
+        task = claim()
+        if task is None:
+            time.sleep(poll_interval)
+        else:
+            execute(task)
+
+
+def stats():
+    """Число задач по состояниям."""
+    counts = dict.fromkeys(dict(Task.STATUSES), 0)
+    counts.update(
+        Task.objects.values_list('status').annotate(
+            count=Count('pk')
+        ).order_by()
+    )
+    return counts
@@ -12,3 +12,17 @@ def addclass(field, css):
 # синтаксис @register... , под который описана функция addclass() -
 # это применение "декораторов", функций, меняющих поведение функций
 # Не бойтесь соб@к
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """
+    Строка запроса для ссылки на страницу: параметры страницы заменяются,
+    остальные (например, запрос поиска) сохраняются.
+    """
+    query = context['request'].GET.copy()
+    for key in ('page', 'after', 'before'):
+        query.pop(key, None)
+    for key, value in params.items():
+        query[key] = value
+    return '?' + query.urlencode()
@@ -0,0 +1,330 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import Group as AuthGroup
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post, User
+
+from . import concurrent, routers, tasks
+from .cache import LRUFileBasedCache
+from .middleware import PIN_COOKIE
+from .models import Task
+
+CALLS = []
+
+
+@tasks.task()
+def remember(value):
+    CALLS.append(value)
+
+
+@tasks.task(max_attempts=2)
+def broken():
+    raise ValueError('сломано')
+
+
+@tasks.task(atomic=False)
+def long_running(reclaimed):
+    tasks.heartbeat()
+    if reclaimed:
+        # Срок истек, задачу забрал другой воркер
+        Task.objects.update(attempts=F('attempts') + 1)
+    tasks.heartbeat()
+    CALLS.append(reclaimed)
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='auth')
+        Post.objects.create(text='Тестовый пост', author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ содержит SQL, шаблоны и кэш в Server-Timing."""
+        response = self.guest_client.get('/')
+        timing = response['Server-Timing']
+        self.assertIn('queries"', timing)
+        self.assertIn('tpl;dur=', timing)
+        # Промахи кэша страниц и фрагмента ленты
+        self.assertIn('cache;desc="hits 0, misses 2"', timing)
+        response = self.guest_client.get('/')
+        self.assertIn(
+            'cache;desc="hits 1, misses 0"', response['Server-Timing']
+        )
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_request_logged_with_queries(self):
+        """Медленный запрос пишется в лог вместе со списком SQL."""
+        with self.assertLogs('core.requests', 'WARNING') as logs:
+            self.guest_client.get('/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], len(record['sql']))
+        self.assertIn('posts_post', record['sql'][-1]['sql'])
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['size'], 0)
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        routers.reset()
+        self.router = routers.PrimaryReplicaRouter()
+
+    def tearDown(self):
+        routers.reset()
+
+    def test_reads_go_to_replicas_until_write(self):
+        """Ленты читаются с реплик, после записи — с основной базы."""
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertIn(
+                self.router.db_for_read(Post), ['replica1', 'replica2']
+            )
+            self.assertEqual(self.router.db_for_read(AuthGroup), 'default')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertTrue(routers.written())
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_transaction_reads_primary(self):
+        """Внутри транзакции чтение идет из основной базы."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def test_write_sets_pin_cookie(self):
+        """После записи ответ закрепляет чтение cookie, чтение — нет."""
+        client = Client()
+        client.force_login(User.objects.create_user(username='writer'))
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+
+class HealthTests(TestCase):
+    def test_health(self):
+        """Проверка состояния отвечает по каждой базе и кэшу."""
+        response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'default': 'ok', 'cache': 'ok'})
+
+    def test_health_hides_errors(self):
+        """Текст ошибки уходит в лог, а не в ответ."""
+        with mock.patch.object(
+            cache, 'set', side_effect=OSError('secret@db-host')
+        ), self.assertLogs('core.views', 'ERROR'):
+            response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['cache'], 'error')
+
+
+class SqlitePragmaTests(TestCase):
+    def test_connection_pragmas(self):
+        """Новое соединение с SQLite получает прагмы из настроек."""
+        raw = connection.connection
+        self.assertEqual(raw.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertEqual(
+            raw.execute('PRAGMA busy_timeout').fetchone()[0],
+            settings.SQLITE_PRAGMAS['busy_timeout'],
+        )
+        self.assertEqual(
+            raw.execute('PRAGMA cache_size').fetchone()[0],
+            settings.SQLITE_PRAGMAS['cache_size'],
+        )
+
+
+class LRUFileBasedCacheTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = LRUFileBasedCache(self.dir, {
+            'OPTIONS': {
+                'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3, 'STATS_FLUSH': 1,
+            },
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def age(self, *keys):
+        """Делает записи старше по очереди: первая — самая старая."""
+        for seconds, key in enumerate(reversed(keys), 1):
+            path = self.cache._key_to_file(key)
+            os.utime(path, (0, os.stat(path).st_mtime - seconds * 60))
+
+    def test_evicts_least_recently_read(self):
+        """При переполнении удаляется запись, которую дольше не читали."""
+        for key in 'abc':
+            self.cache.set(key, key)
+        self.age('a', 'b', 'c')
+        self.assertEqual(self.cache.get('a'), 'a')
+        self.cache.set('d', 'd')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(
+            self.cache.get_many(['a', 'c', 'd']),
+            {'a': 'a', 'c': 'c', 'd': 'd'},
+        )
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual((stats['hits'], stats['misses']), (4, 1))
+
+    def test_size_limit(self):
+        """Общий размер файлов не растет сверх MAX_SIZE."""
+        limited = LRUFileBasedCache(self.dir, {
+            'OPTIONS': {'MAX_SIZE': 3000, 'CULL_FREQUENCY': 2},
+        })
+        for number in range(10):
+            limited.set(f'key{number}', os.urandom(1000))
+        self.assertLess(limited.stats()['bytes'], 4000)
+        self.assertIsNotNone(limited.get('key9'))
+
+
+@override_settings(CONCURRENT_QUERY_WORKERS=2)
+class GatherTests(TransactionTestCase):
+    def test_runs_in_pool_in_order(self):
+        """Функции выполняются в пуле, результаты идут по порядку."""
+        User.objects.create_user(username='auth')
+        results = concurrent.gather(
+            lambda: threading.current_thread().name,
+            lambda: User.objects.count(),
+        )
+        self.assertTrue(results[0].startswith('queries'))
+        self.assertEqual(results[1], 1)
+        with self.assertRaises(User.DoesNotExist):
+            concurrent.gather(lambda: User.objects.get(username='nobody'))
+
+    def test_sequential_inside_transaction(self):
+        """В транзакции функции выполняются в текущем потоке."""
+        with transaction.atomic():
+            name, = concurrent.gather(lambda: threading.current_thread().name)
+        self.assertEqual(name, threading.current_thread().name)
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_priority_and_idempotency_key(self):
+        """Задачи идут по приоритету, ключ не дает поставить дубль."""
+        remember.delay('обычная')
+        remember.delay('срочная', priority=tasks.HIGH, key='urgent')
+        self.assertIsNone(remember.delay('дубль', key='urgent'))
+        self.assertEqual(CALLS, [])
+        self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(CALLS, ['срочная', 'обычная'])
+        self.assertFalse(Task.objects.exists())
+        # После выполнения ключ свободен
+        self.assertIsNotNone(remember.delay('снова', key='urgent'))
+
+    def test_retry_then_fail(self):
+        """Упавшая задача повторяется позже, потом остается с ошибкой."""
+        task = broken.delay(key='broken')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(tasks.run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertIsNone(task.key)
+        self.assertIn('сломано', task.error)
+
+    def test_abandoned_task_reclaimed(self):
+        """Задачу упавшего воркера забирает другой после TASKS_LEASE."""
+        remember.delay('брошенная')
+        self.assertIsNotNone(tasks.claim())
+        self.assertIsNone(tasks.claim())
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(CALLS, ['брошенная'])
+
+    def test_abandoned_task_fails_after_max_attempts(self):
+        """Брошенная задача без оставшихся попыток помечается failed."""
+        task = remember.delay('роковая', key='fatal')
+        Task.objects.update(max_attempts=2)
+        for _ in range(2):
+            self.assertIsNotNone(tasks.claim())
+            Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.assertIsNone(tasks.claim())
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertIsNone(task.key)
+        self.assertEqual(CALLS, [])
+
+    def test_heartbeat_extends_lease(self):
+        """heartbeat() продлевает срок задачи, пока она у воркера."""
+        tasks.heartbeat()
+        task = long_running.delay(False)
+        claimed = tasks.claim()
+        Task.objects.update(locked_until=timezone.now())
+        tasks.current_task.set(claimed)
+        tasks.heartbeat()
+        tasks.current_task.set(None)
+        task.refresh_from_db()
+        self.assertGreater(task.locked_until, timezone.now() + timedelta(
+            seconds=settings.TASKS_LEASE - 60
+        ))
+        self.assertTrue(tasks.execute(claimed))
+        self.assertEqual(CALLS, [False])
+
+    def test_lost_lease_stops_task(self):
+        """Задачу, забранную другим воркером, первый не трогает."""
+        task = long_running.delay(True)
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertFalse(tasks.execute(tasks.claim()))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.RUNNING, 2))
+        self.assertEqual(task.error, '')
+        self.assertEqual(CALLS, [])
+
+
+@override_settings(TASKS_EAGER=True)
+class EagerTaskTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_runs_after_commit(self):
+        """Задача выполняется после фиксации, ошибка не всплывает."""
+        with self.assertLogs('core.tasks', 'INFO') as logs:
+            with transaction.atomic():
+                self.assertIsNone(remember.delay('после'))
+                self.assertEqual(CALLS, [])
+        self.assertEqual(CALLS, ['после'])
+        self.assertIn('мс', logs.output[0])
+        with self.assertLogs('core.tasks', 'ERROR'):
+            broken.delay()
+        self.assertFalse(Task.objects.exists())
+
+    def test_skipped_on_rollback(self):
+        """При откате транзакции задача не выполняется."""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                remember.delay('откат')
+                raise RuntimeError
+        self.assertEqual(CALLS, [])
@@ -0,0 +1,30 @@
+"""
+Прием загружаемых файлов.
+
+Файлы любого размера пишутся во временный файл кусками по мере чтения
+запроса, а не собираются в памяти. Сверх UPLOAD_MAX_BYTES куски только
+считаются: на диск попадает не больше предела, а полный размер файла
+остается в его size, и форма отклоняет файл по размеру. Время приема
+учитывается в метриках запроса (core.metrics).
+"""
+import time
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from . import metrics
+
+
+class MeasuredTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.started = time.perf_counter()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start >= settings.UPLOAD_MAX_BYTES:
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        metrics.count_upload(time.perf_counter() - self.started, file_size)
+        return super().file_complete(file_size)
@@ -1,5 +1,12 @@
+import logging
+
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
 from django.shortcuts import render
 
+logger = logging.getLogger(__name__)
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
@@ -17,3 +24,29 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def health(request):
+    """
+    Проверка для балансировщика: каждая база (основная и реплики)
+    отвечает на SELECT 1, кэш доступен. Иначе 503. Текст ошибки
+    драйвера может содержать адреса и учетные данные, поэтому он
+    только пишется в лог.
+    """
+    checks = {}
+    for alias in connections:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            checks[alias] = 'ok'
+        except DatabaseError:
+            logger.exception('Проверка базы %s', alias)
+            checks[alias] = 'error'
+    try:
+        cache.set('health', 1, 5)
+        checks['cache'] = 'ok' if cache.get('health') == 1 else 'miss'
+    except Exception:
+        logger.exception('Проверка кэша')
+        checks['cache'] = 'error'
+    healthy = all(value == 'ok' for value in checks.values())
+    return JsonResponse(checks, status=200 if healthy else 503)
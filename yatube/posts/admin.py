@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import posts_matching
 
 
 @admin.register(Group)
@@ -23,6 +24,14 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по инвертированному индексу вместо LIKE по всей таблице
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            pk__in=posts_matching(search_term).values('pk')
+        ), False
+
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
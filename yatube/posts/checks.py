@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def digest_site_url(app_configs, **kwargs):
+    """Ссылки в дайджестах абсолютные: без SITE_URL они не откроются."""
+    if settings.DIGEST_ENABLED and not settings.SITE_URL:
+        return [Error(
+            'Дайджесты включены, но SITE_URL не задан',
+            hint='Задайте адрес сайта в переменной окружения SITE_URL',
+            id='posts.E001',
+        )]
+    return []
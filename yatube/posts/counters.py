@@ -0,0 +1,125 @@
+"""
+Денормализованные счетчики пользователей и заметок.
+
+Счетчики меняются сигналами Post/Follow/Comment через UPDATE ... SET
+x = x + 1 в той же транзакции, что и запись. Если строки счетчиков еще
+нет, она создается пересчетом. Расхождения исправляет команда recount.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, PostCounters, User, UserCounters
+
+USER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _user_totals(user_ids=None):
+    """Фактические значения счетчиков пользователей по таблицам."""
+    posts = Post.objects.all()
+    followers = Follow.objects.all()
+    following = Follow.objects.all()
+    if user_ids is not None:
+        posts = posts.filter(author__in=user_ids)
+        followers = followers.filter(author__in=user_ids)
+        following = following.filter(user__in=user_ids)
+    return {
+        'posts_count': _grouped(posts, 'author'),
+        'followers_count': _grouped(followers, 'author'),
+        'following_count': _grouped(following, 'user'),
+    }
+
+
+def _grouped(queryset, field):
+    return dict(
+        queryset.values_list(field).annotate(count=Count('pk')).order_by()
+    )
+
+
+def _adjust(model, pk, recount, **deltas):
+    with transaction.atomic():
+        updated = model.objects.filter(pk=pk).update(**{
+            field: F(field) + delta for field, delta in deltas.items()
+        })
+        # Строки нет: при увеличении создаем ее пересчетом, а уменьшение
+        # без строки возможно лишь при каскадном удалении владельца
+        if not updated and min(deltas.values()) > 0:
+            recount(pk)
+
+
+def adjust_user(user_id, **deltas):
+    _adjust(UserCounters, user_id, recount_user, **deltas)
+
+
+def adjust_post(post_id, **deltas):
+    _adjust(PostCounters, post_id, recount_post, **deltas)
+
+
+def recount_user(user_id):
+    totals = _user_totals([user_id])
+    counters, _ = UserCounters.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            field: values.get(user_id, 0)
+            for field, values in totals.items()
+        },
+    )
+    return counters
+
+
+def recount_post(post_id):
+    counters, _ = PostCounters.objects.update_or_create(
+        post_id=post_id,
+        defaults={
+            'comments_count': Comment.objects.filter(post=post_id).count()
+        },
+    )
+    return counters
+
+
+def for_user(user):
+    """Счетчики пользователя; недостающая строка создается пересчетом."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return recount_user(user.pk)
+
+
+@transaction.atomic
+def recount_users():
+    """Пересчитывает счетчики всех пользователей, возвращает число правок."""
+    totals = _user_totals()
+    existing = UserCounters.objects.in_bulk()
+    changed, created = [], []
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        values = {
+            field: totals[field].get(user_id, 0) for field in USER_FIELDS
+        }
+        counters = existing.get(user_id)
+        if counters is None:
+            created.append(UserCounters(user_id=user_id, **values))
+        elif any(getattr(counters, f) != v for f, v in values.items()):
+            for field, value in values.items():
+                setattr(counters, field, value)
+            changed.append(counters)
+    UserCounters.objects.bulk_create(created)
+    UserCounters.objects.bulk_update(changed, USER_FIELDS)
+    return len(changed) + len(created)
+
+
+@transaction.atomic
+def recount_posts():
+    """Пересчитывает счетчики всех заметок, возвращает число правок."""
+    comments = _grouped(Comment.objects.all(), 'post')
+    existing = PostCounters.objects.in_bulk()
+    changed, created = [], []
+    for post_id in Post.objects.values_list('pk', flat=True).iterator():
+        count = comments.get(post_id, 0)
+        counters = existing.get(post_id)
+        if counters is None:
+            created.append(PostCounters(post_id=post_id, comments_count=count))
+        elif counters.comments_count != count:
+            counters.comments_count = count
+            changed.append(counters)
+    PostCounters.objects.bulk_create(created)
+    PostCounters.objects.bulk_update(changed, ['comments_count'])
+    return len(changed) + len(created)
@@ -0,0 +1,195 @@
+"""
+Письма-дайджесты о новых заметках авторов из подписок.
+
+Вместо письма каждому подписчику на каждую заметку новые заметки
+копятся в окнах по DIGEST_WINDOW секунд: первая заметка окна ставит в
+очередь (core.tasks) рассылку на его конец, и следующие ее не
+дублируют. Рассылка:
+- одним запросом берет заметки окна и одним — подписки на их авторов;
+- шаблон письма компилируется один раз на всю рассылку;
+- письма уходят пачками по DIGEST_BATCH_SIZE через одно соединение с
+  почтовым сервером, не быстрее DIGEST_RATE писем в секунду;
+- после каждой пачки запоминает, по какой момент ее получатели получили
+  заметки (Digest): следующая рассылка начинается с этого момента, а
+  повтор упавшей не шлет письма снова;
+- перед каждой пачкой продлевает срок задачи (core.tasks.heartbeat):
+  долгую рассылку не заберет второй воркер, а если срок все же истек,
+  рассылка останавливается, не отправив дубли.
+
+Работает с любым EMAIL_BACKEND, в том числе с файловым: письма
+рассылки пишутся в один файл в EMAIL_FILE_PATH. При TASKS_EAGER
+рассылку запускает команда send_digests.
+"""
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.db.models import Max
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.tasks import LOW, heartbeat, task
+
+from .models import Digest, Follow, Post, User
+
+TEMPLATE = 'emails/digest.txt'
+
+
+class RateLimiter:
+    """В среднем не больше rate писем в секунду; rate=0 — без предела."""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.clock = clock
+        self.sleep = sleep
+        self.ready = clock()
+
+    def wait(self, count):
+        if not self.rate:
+            return
+        delay = self.ready - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        self.ready = max(self.ready, self.clock()) + count / self.rate
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def window_posts(since, until):
+    """Заметки окна по авторам, от новых к старым."""
+    posts = defaultdict(list)
+    for post in Post.objects.filter(
+        pub_date__gt=since, pub_date__lte=until
+    ).select_related('author', 'group').order_by('-pub_date', '-pk'):
+        posts[post.author_id].append(post)
+    return posts
+
+
+def recipients(author_ids):
+    """{подписчик: [авторы]} для подписчиков с адресом почты."""
+    follows = Follow.objects.filter(author__in=author_ids).exclude(
+        user__email=''
+    ).values_list('user', 'author')
+    authors = defaultdict(list)
+    for user_id, author_id in follows:
+        authors[user_id].append(author_id)
+    return authors
+
+
+def message(template, user, posts):
+    shown = posts[:settings.DIGEST_MAX_POSTS]
+    body = template.render({
+        'user': user,
+        'posts': [
+            (post, settings.SITE_URL + reverse(
+                'posts:post_detail', args=[post.pk]
+            ))
+            for post in shown
+        ],
+        'more': len(posts) - len(shown),
+        'follow_url': settings.SITE_URL + reverse('posts:follow_index'),
+    })
+    return mail.EmailMessage(
+        f'Новые заметки в ваших подписках: {len(posts)}',
+        body,
+        to=[user.email],
+    )
+
+
+def user_posts(posts, author_ids):
+    return sorted(
+        (post for author_id in author_ids for post in posts[author_id]),
+        key=lambda post: (post.pub_date, post.pk),
+        reverse=True,
+    )
+
+
+def previous_run(until):
+    """Момент, по который прошла предыдущая рассылка."""
+    previous = Digest.objects.filter(sent_until__lt=until).aggregate(
+        previous=Max('sent_until')
+    )['previous']
+    return previous or until - timedelta(seconds=settings.DIGEST_WINDOW)
+
+
+def send(until=None):
+    """
+    Рассылает заметки, опубликованные после предыдущей рассылки и по
+    момент until; возвращает число писем. Подписчики, которым письмо
+    по этот момент уже ушло, пропускаются.
+    """
+    until = until or timezone.now()
+    posts = window_posts(previous_run(until), until)
+    followed = recipients(list(posts))
+    done = set(Digest.objects.filter(
+        user__in=list(followed), sent_until__gte=until
+    ).values_list('user', flat=True))
+    template = get_template(TEMPLATE)
+    limiter = RateLimiter(settings.DIGEST_RATE)
+    sent = 0
+    with mail.get_connection() as connection:
+        for user_ids in batched(
+            sorted(set(followed) - done), settings.DIGEST_BATCH_SIZE
+        ):
+            heartbeat()
+            messages = [
+                message(template, user, user_posts(posts, followed[user.pk]))
+                for user in User.objects.filter(pk__in=user_ids)
+            ]
+            limiter.wait(len(messages))
+            sent += connection.send_messages(messages) or 0
+            mark_sent(user_ids, until)
+    return sent
+
+
+@transaction.atomic
+def mark_sent(user_ids, until):
+    Digest.objects.filter(user__in=user_ids).update(sent_until=until)
+    Digest.objects.bulk_create(
+        (Digest(user_id=user_id, sent_until=until) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+
+
+# Без общей транзакции: отметки об отправленных пачках должны
+# сохраниться, даже если следующая пачка упадет
+@task(priority=LOW, atomic=False)
+def send_digests(until):
+    send(parse_datetime(until))
+
+
+def window_end(moment):
+    """Конец окна: ближайший момент, кратный DIGEST_WINDOW секундам."""
+    window = settings.DIGEST_WINDOW
+    return datetime.fromtimestamp(
+        math.ceil(moment.timestamp() / window) * window, timezone.utc
+    )
+
+
+def schedule():
+    """
+    Ставит рассылку на конец текущего окна, если она еще не стоит. Конец
+    окна — и аргумент, и ключ задачи: повтор упавшей рассылки шлет те
+    же заметки и только тем, кому они еще не ушли, а заметка следующего
+    окна ставит следующую рассылку. При TASKS_EAGER задача выполнилась
+    бы сразу после запроса, письмом на заметку, поэтому рассылку
+    запускает команда send_digests.
+    """
+    if settings.TASKS_EAGER:
+        return
+    now = timezone.now()
+    until = window_end(now)
+    send_digests.delay(
+        until.isoformat(),
+        key=f'digests:{until.isoformat()}',
+        countdown=(until - now).total_seconds(),
+    )
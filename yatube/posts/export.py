@@ -0,0 +1,72 @@
+"""
+Потоковая выгрузка таблиц для аналитики.
+
+Строки читаются по возрастанию id через .iterator(chunk_size): в памяти
+одновременно не больше одной пачки, сколько бы строк ни было в таблице.
+На PostgreSQL это серверный курсор (если его не отключает
+DISABLE_SERVER_SIDE_CURSORS), на SQLite — fetchmany. Выгрузку можно
+продолжить с места обрыва: after — последний полученный id.
+"""
+import csv
+import json
+from datetime import datetime
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE = 2000
+FORMATS = ('ndjson', 'csv')
+
+TABLES = {
+    'posts': (Post, ('id', 'text', 'pub_date', 'author_id', 'group_id',
+                     'image')),
+    'comments': (Comment, ('id', 'text', 'created', 'author_id',
+                           'post_id')),
+    'follows': (Follow, ('id', 'user_id', 'author_id')),
+    'groups': (Group, ('id', 'title', 'slug', 'description')),
+}
+
+
+def rows(table, after=None, until=None, chunk_size=CHUNK_SIZE):
+    """Кортежи полей TABLES[table] для id в (after, until]."""
+    model, fields = TABLES[table]
+    queryset = model.objects.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    if until is not None:
+        queryset = queryset.filter(pk__lte=until)
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(table, values):
+    _, fields = TABLES[table]
+    for row in values:
+        yield json.dumps(
+            dict(zip(fields, map(_value, row))), ensure_ascii=False
+        ) + '\n'
+
+
+def csv_lines(table, values):
+    _, fields = TABLES[table]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in values:
+        yield writer.writerow(map(_value, row))
+
+
+def lines(table, export_format, **kwargs):
+    """Строки выгрузки в формате ndjson или csv."""
+    encode = ndjson_lines if export_format == 'ndjson' else csv_lines
+    return encode(table, rows(table, **kwargs))
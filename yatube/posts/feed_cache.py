@@ -0,0 +1,145 @@
+"""
+Версионируемый кэш лент.
+
+Ключ фрагмента строится из идентичности ленты (общая, группа, автор,
+подписки пользователя), номеров версий этой ленты и страницы. Сигналы
+Post/Comment/Follow увеличивают версии затронутых лент, поэтому
+изменения видны сразу, без ожидания истечения TTL: старые фрагменты
+просто перестают запрашиваться и вытесняются кэшем.
+"""
+import hashlib
+import random
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+
+VERSION_PREFIX = 'feedcache:version:'
+FRAGMENT_PREFIX = 'feedcache:fragment:'
+COUNT_PREFIX = 'feedcache:count:'
+HITS_KEY = 'feedcache:stats:hits'
+MISSES_KEY = 'feedcache:stats:misses'
+# Счетчики попаданий пишутся для одного обращения из стольких (с тем же
+# весом): запись в общий кэш на каждый фрагмент дороже самого чтения
+STATS_SAMPLE_EVERY = 100
+
+
+def feed_id(kind, ident=None):
+    """
+    Идентичность ленты: global, group:<slug>, author:<pk>, follow:<pk>;
+    для кэша страниц (posts.page_cache) еще profile:<username> и
+    post:<pk>.
+    """
+    if ident is None:
+        return kind
+    # Ключ должен оставаться допустимым и для memcached
+    return f'{kind}:{quote(str(ident), safe="")}'
+
+
+def dependencies(feed):
+    """
+    Ленты, версии которых входят в ключ фрагмента.
+
+    Лента подписок зависит от подписок пользователя и от общей ленты:
+    любой пост из ленты подписок есть и в общей ленте, а сброс
+    по версии общей ленты обходится O(1) вместо обхода подписчиков.
+    """
+    if feed.startswith('follow:'):
+        return (feed, 'global')
+    return (feed,)
+
+
+def _new_version():
+    # Версия по времени не совпадет с версией, вытесненной из кэша
+    return time.time_ns()
+
+
+def get_versions(feeds):
+    keys = [VERSION_PREFIX + feed for feed in feeds]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*feeds):
+    """Увеличивает версии лент: закэшированные фрагменты устаревают."""
+    for feed in feeds:
+        key = VERSION_PREFIX + feed
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def bump_for_post(post, group_slug=None):
+    """Сбрасывает ленты и страницы, в которых показывается пост."""
+    feeds = [
+        feed_id('global'),
+        feed_id('author', post.author_id),
+        feed_id('profile', post.author.username),
+        feed_id('post', post.pk),
+    ]
+    if post.group_id is not None:
+        feeds.append(feed_id('group', post.group.slug))
+    if group_slug is not None:
+        feeds.append(feed_id('group', group_slug))
+    bump(*feeds)
+
+
+def fragment_key(feed, page):
+    versions = get_versions(dependencies(feed))
+    digest = hashlib.md5(page.encode()).hexdigest()
+    return '{}{}:{}:{}'.format(
+        FRAGMENT_PREFIX, feed, '.'.join(map(str, versions)), digest
+    )
+
+
+def count_key(feed):
+    """Ключ числа заметок ленты: меняется вместе с версиями ленты."""
+    versions = get_versions(dependencies(feed))
+    return '{}{}:{}'.format(
+        COUNT_PREFIX, feed, '.'.join(map(str, versions))
+    )
+
+
+def get_fragment(key):
+    value = cache.get(key)
+    if random.random() * STATS_SAMPLE_EVERY < 1:
+        _count(HITS_KEY if value is not None else MISSES_KEY)
+    metrics.count_cache(value is not None)
+    return value
+
+
+def set_fragment(key, value):
+    cache.set(key, value, settings.FEED_CACHE_TIMEOUT)
+
+
+def _count(key):
+    try:
+        cache.incr(key, STATS_SAMPLE_EVERY)
+    except ValueError:
+        # Счетчика еще нет, или кэш не хранит значений (DummyCache)
+        cache.add(key, STATS_SAMPLE_EVERY, None)
+
+
+def stats():
+    """Счетчики попаданий и промахов кэша лент (по выборке)."""
+    values = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
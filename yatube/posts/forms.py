@@ -1,6 +1,13 @@
+import time
+
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from core import metrics
 
-from .models import Comment, Post
+from .models import Comment, Group, Post
+from .validators import validate_image_header, validate_upload_size
 
 
 class PostForm(forms.ModelForm):
@@ -8,8 +15,51 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл больше UPLOAD_MAX_BYTES обработчик загрузки обрезает, и
+        # ImageField отклонил бы его как битую картинку: такой файл
+        # проверяется только по размеру, в clean_image
+        self.oversized = None
+        field = self.add_prefix('image')
+        upload = self.files.get(field)
+        if upload is not None and upload.size > settings.UPLOAD_MAX_BYTES:
+            self.files = self.files.copy()
+            del self.files[field]
+            self.oversized = upload
+
+    def clean_image(self):
+        """
+        Ограничения на картинку по заголовку. ImageField только открывает
+        файл и вызывает verify(), пиксели декодирует и пересохраняет
+        фоновая задача posts.thumbnails.
+        """
+        if self.oversized is not None:
+            validate_upload_size(self.oversized)
+        image = self.cleaned_data['image']
+        # У формы правки без новой картинки здесь прежний FieldFile
+        if isinstance(image, UploadedFile):
+            started = time.perf_counter()
+            try:
+                validate_image_header(image)
+            finally:
+                metrics.count_upload(time.perf_counter() - started)
+            image.seek(0)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Искать', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Сообщество',
+        to_field_name='slug',
+        required=False,
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
@@ -0,0 +1,387 @@
+"""
+Пакетный импорт пользователей, групп, заметок с комментариями и подписок.
+
+Источник — файлы NDJSON, по объекту на строку. Связи указываются
+именами: username автора, slug группы; комментарии вложены в заметку:
+
+    {"author": "leo", "group": "cats", "text": "...", "pub_date": "...",
+     "image": "2021/cat.jpg", "comments": [{"author": "ann", "text": "..."}]}
+
+Строки проверяются тем же validate_not_empty, что и формы, и пишутся
+через bulk_create пачками, каждая пачка — в своей транзакции. Строки
+с ошибками в данных (пустой текст, неизвестный автор) пропускаются и
+попадают в отчет. Битый JSON или строка не той формы (не объект, не
+строка в текстовом поле, комментарии не списком) означают, что файл
+собран неправильно: check() находит их до импорта и бросает
+MalformedRow с номером строки. Имена
+пользователей и адреса групп разрешаются через словари в памяти,
+картинки копируются пулом потоков. bulk_create обходит сигналы, поэтому
+счетчики, поисковый индекс, ленты подписок и кэш лент обновляются
+отдельно: индекс — по пачкам, остальное — в finish().
+"""
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed_cache, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, SearchEntry, User
+from .validators import validate_not_empty
+
+BATCH_SIZE = 1000
+WORKERS = 4
+
+# Текстовые поля строк каждого файла и вложенных комментариев
+FIELDS = {
+    'users': ('username', 'first_name', 'last_name', 'email'),
+    'groups': ('slug', 'title', 'description'),
+    'posts': ('author', 'group', 'text', 'pub_date', 'image'),
+    'follows': ('user', 'author'),
+}
+COMMENT_FIELDS = ('author', 'text', 'created')
+# Необязательные поля, которые могут быть null
+NULLABLE = {'group', 'pub_date', 'image', 'created'}
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class MalformedRow(ValueError):
+    """Строка файла — не JSON или не той формы."""
+
+
+def shape_error(data, fields):
+    """Чем строка не той формы или None, если форма верная."""
+    if not isinstance(data, dict):
+        return 'ожидался объект'
+    for field in fields:
+        value = data.get(field)
+        if field not in data or isinstance(value, str):
+            continue
+        if value is None and field in NULLABLE:
+            continue
+        return f'{field}: ожидалась строка'
+    return None
+
+
+def row_error(kind, data):
+    error = shape_error(data, FIELDS[kind])
+    if error is not None or kind != 'posts':
+        return error
+    comments = data.get('comments', [])
+    if not isinstance(comments, list):
+        return 'comments: ожидался список'
+    for comment in comments:
+        error = shape_error(comment, COMMENT_FIELDS)
+        if error is not None:
+            return f'comments: {error}'
+    return None
+
+
+def insert(model, objects):
+    """
+    bulk_create, после которого у объектов есть pk. SQLite не возвращает
+    id вставленных строк, но до конца транзакции база заблокирована на
+    запись нами, и последние len(objects) строк таблицы — наши.
+    """
+    model.objects.bulk_create(objects)
+    if objects and objects[0].pk is None:
+        ids = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:len(objects)]
+        for obj, pk in zip(objects, reversed(ids)):
+            obj.pk = pk
+    return objects
+
+
+@contextmanager
+def original_dates():
+    """
+    Даты из источника вместо auto_now_add: bulk_create иначе проставил
+    бы всем строкам текущее время. Меняет поля моделей, поэтому импорт
+    идет в команде, а не в потоках сервера.
+    """
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Report:
+    def __init__(self):
+        self.created = Counter()
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, kind, number, message):
+        self.errors.append(f'{kind}:{number}: {message}')
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return sum(self.created.values()) / self.elapsed
+
+
+class Importer:
+    def __init__(self, images_dir=None, batch_size=BATCH_SIZE,
+                 workers=WORKERS):
+        self.images_dir = images_dir
+        self.batch_size = batch_size
+        self.workers = workers
+        self.report = Report()
+        self.user_ids = dict(User.objects.values_list('username', 'pk'))
+        self.group_ids = dict(Group.objects.values_list('slug', 'pk'))
+        # Кого коснулся импорт: их ленты сбрасываются в finish()
+        self.authors = set()
+        self.followers = set()
+        self.group_pks = set()
+        self.images = []
+
+    def read(self, kind, path):
+        """
+        Пары (номер строки, объект) файла NDJSON. Битая строка или
+        строка не той формы вызывает MalformedRow.
+        """
+        with open(path, encoding='utf-8') as source:
+            for number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as error:
+                    raise MalformedRow(f'{kind}:{number}: {error}')
+                error = row_error(kind, data)
+                if error is not None:
+                    raise MalformedRow(f'{kind}:{number}: {error}')
+                yield number, data
+
+    def check(self, kind, path):
+        """
+        Проверяет форму всех строк файла, ничего не записывая: импорт,
+        прерванный на середине, оставил бы записанные пачки без
+        finish().
+        """
+        for _ in self.read(kind, path):
+            pass
+
+    def valid(self, kind, number, *values):
+        try:
+            for value in values:
+                validate_not_empty(value)
+        except ValidationError as error:
+            self.report.error(kind, number, error.messages[0])
+            return False
+        return True
+
+    def date(self, value):
+        parsed = parse_datetime(value) if value else None
+        if parsed is None:
+            return timezone.now()
+        if timezone.is_naive(parsed):
+            return timezone.make_aware(parsed)
+        return parsed
+
+    def users(self, path):
+        for batch in batched(self.read('users', path), self.batch_size):
+            objects = []
+            for number, data in batch:
+                username = data.get('username', '')
+                if not self.valid('users', number, username):
+                    continue
+                if username in self.user_ids:
+                    self.report.error('users', number, 'уже есть')
+                    continue
+                self.user_ids[username] = None
+                objects.append(User(
+                    username=username,
+                    first_name=data.get('first_name', ''),
+                    last_name=data.get('last_name', ''),
+                    email=data.get('email', ''),
+                    password=make_password(None),
+                ))
+            with transaction.atomic():
+                for user in insert(User, objects):
+                    self.user_ids[user.username] = user.pk
+            self.report.created['users'] += len(objects)
+
+    def groups(self, path):
+        for batch in batched(self.read('groups', path), self.batch_size):
+            objects = []
+            for number, data in batch:
+                slug = data.get('slug', '')
+                title = data.get('title', '')
+                if not self.valid('groups', number, slug, title):
+                    continue
+                if slug in self.group_ids:
+                    self.report.error('groups', number, 'уже есть')
+                    continue
+                self.group_ids[slug] = None
+                objects.append(Group(
+                    slug=slug, title=title,
+                    description=data.get('description', ''),
+                ))
+            with transaction.atomic():
+                for group in insert(Group, objects):
+                    self.group_ids[group.slug] = group.pk
+            self.report.created['groups'] += len(objects)
+
+    def post_row(self, number, data):
+        """Заметка и данные ее комментариев или None при ошибке."""
+        author_id = self.user_ids.get(data.get('author'))
+        group_id = self.group_ids.get(data.get('group'))
+        if author_id is None:
+            self.report.error('posts', number, 'неизвестный автор')
+        elif data.get('group') and group_id is None:
+            self.report.error('posts', number, 'неизвестная группа')
+        elif self.valid('posts', number, data.get('text', '')):
+            return Post(
+                text=data['text'],
+                author_id=author_id,
+                group_id=group_id,
+                pub_date=self.date(data.get('pub_date')),
+            ), data.get('comments', [])
+        return None
+
+    def comment_objects(self, number, post, comments):
+        for data in comments:
+            author_id = self.user_ids.get(data.get('author'))
+            if author_id is None:
+                self.report.error('posts', number, 'неизвестный комментатор')
+            elif self.valid('posts', number, data.get('text', '')):
+                yield Comment(
+                    text=data['text'],
+                    author_id=author_id,
+                    post=post,
+                    created=self.date(data.get('created')),
+                )
+
+    def copy_image(self, path):
+        # Хранилище поля: одинаковые картинки не копируются дважды
+        with open(os.path.join(self.images_dir, path), 'rb') as image:
+            return Post._meta.get_field('image').storage.save(
+                f'posts/{os.path.basename(path)}', File(image)
+            )
+
+    def copy_images(self, pool, rows):
+        """Копирует картинки пачки параллельно и проставляет их заметкам."""
+        futures = [
+            (number, post, pool.submit(self.copy_image, data['image']))
+            for number, data, (post, _) in rows
+            if data.get('image') and self.images_dir
+        ]
+        for number, post, future in futures:
+            try:
+                post.image = future.result()
+            except OSError as error:
+                self.report.error('posts', number, f'картинка: {error}')
+
+    def posts(self, path):
+        with ThreadPoolExecutor(self.workers) as pool, original_dates():
+            for batch in batched(self.read('posts', path), self.batch_size):
+                rows = []
+                for number, data in batch:
+                    row = self.post_row(number, data)
+                    if row is not None:
+                        rows.append((number, data, row))
+                self.copy_images(pool, rows)
+                with transaction.atomic():
+                    self.save_posts(rows)
+
+    def save_posts(self, rows):
+        posts = insert(Post, [post for _, _, (post, _) in rows])
+        comments = {
+            post: list(self.comment_objects(number, post, data))
+            for (number, _, (_, data)), post in zip(rows, posts)
+        }
+        Comment.objects.bulk_create(
+            comment for post_comments in comments.values()
+            for comment in post_comments
+        )
+        SearchEntry.objects.bulk_create(
+            SearchEntry(term=term, post=post, weight=weight)
+            for post, post_comments in comments.items()
+            for term, weight in search.post_terms(
+                post, [comment.text for comment in post_comments]
+            ).items()
+        )
+        for post, post_comments in comments.items():
+            self.authors.add(post.author_id)
+            if post.group_id:
+                self.group_pks.add(post.group_id)
+            if post.image:
+                self.images.append(post.image.name)
+            self.report.created['comments'] += len(post_comments)
+        self.report.created['posts'] += len(posts)
+
+    def follows(self, path):
+        for batch in batched(self.read('follows', path), self.batch_size):
+            objects = []
+            for number, data in batch:
+                user_id = self.user_ids.get(data.get('user'))
+                author_id = self.user_ids.get(data.get('author'))
+                if user_id is None or author_id is None:
+                    self.report.error('follows', number, 'нет пользователя')
+                elif user_id == author_id:
+                    self.report.error('follows', number, 'подписка на себя')
+                else:
+                    objects.append(
+                        Follow(user_id=user_id, author_id=author_id)
+                    )
+                    self.followers.add(user_id)
+            with transaction.atomic():
+                Follow.objects.bulk_create(objects, ignore_conflicts=True)
+            self.report.created['follows'] += len(objects)
+
+    def changed_feeds(self):
+        slugs = Group.objects.filter(pk__in=self.group_pks).values_list(
+            'slug', flat=True
+        )
+        yield feed_cache.feed_id('global')
+        for slug in slugs:
+            yield feed_cache.feed_id('group', slug)
+        for pk in self.authors:
+            yield feed_cache.feed_id('author', pk)
+        for pk in self.followers:
+            yield feed_cache.feed_id('follow', pk)
+
+    def finish(self):
+        """То, что при обычном сохранении делают сигналы."""
+        counters.recount_users()
+        counters.recount_posts()
+        if timeline.is_enabled():
+            followers = self.followers | set(Follow.objects.filter(
+                author__in=self.authors
+            ).values_list('user', flat=True))
+            for user in User.objects.filter(pk__in=followers).iterator():
+                timeline.rebuild(user)
+        feed_cache.bump(*self.changed_feeds())
+        for name in self.images:
+            thumbnails.schedule(name)
+        return self.report
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает таблицу в NDJSON или CSV потоком, не загружая ее в '
+        'память. Прерванную выгрузку продолжает --after с последним id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(export.TABLES))
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='ndjson',
+        )
+        parser.add_argument(
+            '--after', type=int, help='Начать со следующего после id',
+        )
+        parser.add_argument(
+            '--until', type=int, help='Закончить на id включительно',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки, по умолчанию stdout',
+        )
+
+    def handle(self, *args, **options):
+        output = (
+            open(options['output'], 'w', encoding='utf-8', newline='')
+            if options['output'] else self.stdout
+        )
+        try:
+            output.writelines(export.lines(
+                options['table'],
+                options['format'],
+                after=options['after'],
+                until=options['until'],
+                chunk_size=options['chunk_size'],
+            ))
+        finally:
+            if output is not self.stdout:
+                output.close()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает счетчики попаданий и промахов кэша лент, посчитанные '
+        'по выборке обращений'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счетчики после вывода',
+        )
+
+    def handle(self, *args, **options):
+        stats = feed_cache.stats()
+        self.stdout.write(
+            'hits: {hits}\nmisses: {misses}\n'
+            'hit ratio: {hit_ratio:.2%}'.format(**stats)
+        )
+        if options['reset']:
+            feed_cache.reset_stats()
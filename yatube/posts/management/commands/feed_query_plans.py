@@ -0,0 +1,150 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts import counters, timeline
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import KeysetPaginator
+
+BATCH_SIZE = 10000
+REPEAT = 3
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время запросов лент. С --compare запросы '
+        'выполняются дважды: без индексов лент (они удаляются внутри '
+        'откатываемой транзакции) и с ними. --seed заполняет базу '
+        'тестовыми данными, например --seed 1000000.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Сколько постов создать перед замерами',
+        )
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Сравнить планы без индексов лент и с ними',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        if not Post.objects.exists():
+            raise CommandError('В базе нет постов, используйте --seed')
+        probe = self.probe()
+        if options['compare']:
+            self.stdout.write(self.style.MIGRATE_HEADING('Без индексов'))
+            with transaction.atomic():
+                self.drop_indexes()
+                self.report(probe)
+                transaction.set_rollback(True)
+            self.stdout.write(self.style.MIGRATE_HEADING('С индексами'))
+        self.report(probe)
+
+    def seed(self, posts_count):
+        """Быстро заполняет базу через bulk_create, минуя сигналы."""
+        users_count = max(posts_count // 100, 10)
+        prefix = f'bench{int(time.time())}'
+        User.objects.bulk_create(
+            User(username=f'{prefix}_{number}')
+            for number in range(users_count)
+        )
+        users = list(User.objects.filter(username__startswith=prefix))
+        Group.objects.bulk_create(
+            Group(
+                title=f'Группа {number}',
+                slug=f'{prefix}-{number}',
+                description='Сгенерировано для замеров',
+            )
+            for number in range(50)
+        )
+        groups = list(Group.objects.filter(slug__startswith=prefix))
+        follows = {
+            (user.pk, random.choice(users).pk)
+            for user in users for _ in range(20)
+        }
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in follows if user_id != author_id
+            ),
+            ignore_conflicts=True,
+        )
+        for start in range(0, posts_count, BATCH_SIZE):
+            size = min(BATCH_SIZE, posts_count - start)
+            Post.objects.bulk_create(
+                Post(
+                    text=f'Пост {start + number}',
+                    author=random.choice(users),
+                    group=random.choice(groups + [None]),
+                )
+                for number in range(size)
+            )
+            self.stdout.write(f'Постов создано: {start + size}')
+        counters.recount_users()
+        counters.recount_posts()
+
+    def probe(self):
+        """Пользователь, группа и пост, на которых строятся запросы."""
+        post = Post.objects.exclude(group=None).first() or Post.objects.first()
+        reader = Follow.objects.filter(author=post.author).first()
+        reader = reader.user if reader else post.author
+        if timeline.is_enabled():
+            timeline.rebuild(reader)
+        return {'post': post, 'reader': reader}
+
+    def queries(self, probe):
+        post, reader = probe['post'], probe['reader']
+        feeds = {
+            'index': Post.objects.all(),
+            'group_posts': Post.objects.filter(group=post.group_id),
+            'profile': Post.objects.filter(author=post.author_id),
+            'follow_index': timeline.follow_feed(reader),
+        }
+        for name, queryset in feeds.items():
+            paginator = KeysetPaginator(
+                queryset.select_related('author', 'group', 'counters'),
+                settings.PAGE_SIZE,
+            )
+            page = paginator.object_list[:settings.PAGE_SIZE + 1]
+            yield name, page
+            # Глубокая страница: курсор из середины ленты
+            middle = queryset.order_by('-pub_date', '-pk').values_list(
+                'pub_date', 'pk'
+            )
+            count = min(queryset.count(), 100000)
+            if count > 1:
+                cursor = list(middle[count // 2:count // 2 + 1])[0]
+                yield f'{name} (deep)', paginator.object_list.filter(
+                    paginator._seek(cursor, reverse=False)
+                )[:settings.PAGE_SIZE + 1]
+        yield 'post_detail comments', Comment.objects.filter(
+            post=post
+        ).select_related('author').order_by('created', 'pk')
+        yield 'fan-out followers', Follow.objects.filter(
+            author=post.author_id
+        ).values_list('user', flat=True)
+
+    def report(self, probe):
+        for name, queryset in self.queries(probe):
+            timings = []
+            for _ in range(REPEAT):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                self.style.SQL_TABLE(f'{name}: {min(timings) * 1000:.2f} ms')
+            )
+            self.stdout.write(queryset.explain())
+
+    def drop_indexes(self):
+        editor = connection.schema_editor(collect_sql=True)
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, Follow):
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.remove_sql(model, editor)))
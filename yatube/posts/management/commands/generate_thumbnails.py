@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+BATCH_SIZE = 500
+WORKERS = 2
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает миниатюры картинок заметок, которых еще нет в манифесте '
+        '(с --all - всех картинок)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать миниатюры всех картинок',
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            default=WORKERS,
+            help='Число потоков',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        if not options['all']:
+            names = [
+                name for name in names if thumbnails.manifest(name) is None
+            ]
+        done, failed = [], 0
+        with ThreadPoolExecutor(options['workers']) as pool:
+            for name, result in zip(names, pool.map(self.render, names)):
+                if result is None:
+                    failed += 1
+                    continue
+                thumbnails.record({name: result})
+                done.append(name)
+        for start in range(0, len(done), BATCH_SIZE):
+            thumbnails.refresh_pages(done[start:start + BATCH_SIZE])
+        self.stdout.write(f'Создано: {len(done)}, ошибок: {failed}')
+
+    def render(self, name):
+        try:
+            return thumbnails.render(name)
+        except (OSError, ValueError) as error:
+            self.stderr.write(f'{name}: {error}')
+            return None
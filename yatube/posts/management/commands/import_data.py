@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+MAX_ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует группы, пользователей, заметки с комментариями и '
+        'подписки из файлов NDJSON пачками через bulk_create. Формат '
+        'строк описан в posts/importer.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', help='Файл групп')
+        parser.add_argument('--users', help='Файл пользователей')
+        parser.add_argument('--posts', help='Файл заметок')
+        parser.add_argument('--follows', help='Файл подписок')
+        parser.add_argument(
+            '--images-dir', help='Каталог, от которого отсчитаны картинки',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--workers', type=int, default=importer.WORKERS,
+            help='Потоков копирования картинок',
+        )
+
+    def handle(self, *args, **options):
+        kinds = ('groups', 'users', 'posts', 'follows')
+        if not any(options[kind] for kind in kinds):
+            raise CommandError('Не указано ни одного файла')
+        run = importer.Importer(
+            images_dir=options['images_dir'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+        )
+        files = [(kind, options[kind]) for kind in kinds if options[kind]]
+        # Все файлы проверяются до записи первой пачки
+        try:
+            for kind, path in files:
+                run.check(kind, path)
+        except importer.MalformedRow as error:
+            raise CommandError(f'Импорт не начат: {error}')
+        # Порядок важен: заметки ссылаются на группы и пользователей
+        for kind, path in files:
+            getattr(run, kind)(path)
+        report = run.finish()
+        for kind in kinds:
+            self.stdout.write(f'{kind}: {report.created[kind]}')
+        self.stdout.write(f'comments: {report.created["comments"]}')
+        self.stdout.write(
+            f'{report.elapsed:.1f} с, {report.rows_per_second:.0f} строк/с'
+        )
+        if report.errors:
+            self.stderr.write(f'Пропущено строк: {len(report.errors)}')
+            for error in report.errors[:MAX_ERRORS_SHOWN]:
+                self.stderr.write(error)
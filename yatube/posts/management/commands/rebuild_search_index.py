@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс заметок и комментариев'
+
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        self.stdout.write(f'Проиндексировано заметок: {count}')
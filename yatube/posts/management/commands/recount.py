@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики пользователей и заметок по таблицам'
+
+    def handle(self, *args, **options):
+        users = counters.recount_users()
+        posts = counters.recount_posts()
+        self.stdout.write(
+            f'Исправлено счетчиков: пользователей {users}, заметок {posts}'
+        )
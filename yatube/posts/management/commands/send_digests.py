@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import digest
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылает дайджесты заметок, опубликованных после предыдущей '
+        'рассылки (posts.digest); для cron при TASKS_EAGER'
+    )
+
+    def handle(self, *args, **options):
+        sent = digest.send()
+        self.stdout.write(f'Отправлено писем: {sent}')
@@ -0,0 +1,70 @@
+"""
+Подсчет ссылок на картинки заметок.
+
+Картинки хранятся по содержимому (core.storage), и один файл может быть
+у нескольких заметок. Когда заметку удаляют или меняют ей картинку,
+фоновая задача через MEDIA_DELETE_DELAY секунд удаляет прежний файл и
+его миниатюры, если на него больше не ссылается ни одна заметка.
+Задержка дает повторной загрузке тех же байтов (хранилище отдает ей уже
+лежащий файл) сохранить заметку до проверки. Загрузку, заметка которой
+еще не сохранена, выдает версия файла (core.storage): проверка и
+удаление идут под блокировкой хранилища, и файл, загруженный снова
+после освобождения, не удаляется.
+"""
+import logging
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+
+from core.tasks import LOW, task
+
+from . import thumbnails
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def references(name):
+    return Post.objects.filter(image=name).count()
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def _collect(name, version):
+    with storage().lock(name):
+        if references(name):
+            return
+        # Файла уже нет (None), но миниатюры могли остаться
+        current = storage().version(name)
+        if current is not None and current != version:
+            return
+        storage().delete(name)
+    thumbnails.forget(name)
+
+
+@task(priority=LOW)
+def collect(name, version):
+    """Удаляет файл, если его версия та же, что при освобождении."""
+    try:
+        _collect(name, version)
+    except (OSError, SuspiciousFileOperation) as error:
+        # Имя вне MEDIA_ROOT или файл уже недоступен: заметке это не мешает
+        logger.warning('Не удалось удалить картинку %s: %s', name, error)
+
+
+def release(name):
+    """
+    Ставит удаление файла, если к сроку он будет не нужен. У каждого
+    освобождения своя задача со своим моментом: файл, загруженный снова
+    и снова освобожденный, удалит последняя.
+    """
+    if not name:
+        return
+    try:
+        version = storage().version(name)
+    except SuspiciousFileOperation:
+        # Имя вне MEDIA_ROOT: удалять нечего
+        return
+    collect.delay(name, version, countdown=settings.MEDIA_DELETE_DELAY)
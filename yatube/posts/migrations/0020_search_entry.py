@@ -0,0 +1,73 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:26
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия токенизатора posts.search на момент миграции: код приложения
+# может измениться, а миграция должна давать тот же индекс
+TEXT_WEIGHT = 2
+MAX_TERM_LENGTH = 64
+WORD_RE = re.compile(r'\w{2,}')
+
+
+def terms(text):
+    return Counter(
+        word[:MAX_TERM_LENGTH].replace('ё', 'е')
+        for word in WORD_RE.findall(text.lower())
+    )
+
+
+def post_terms(post, comments=()):
+    weights = Counter()
+    for term, count in terms(post.text).items():
+        weights[term] += count * TEXT_WEIGHT
+    for text in comments:
+        weights.update(terms(text))
+    return weights
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchEntry = apps.get_model('posts', 'SearchEntry')
+    comments = {}
+    for post_id, text in Comment.objects.values_list('post', 'text'):
+        comments.setdefault(post_id, []).append(text)
+    for post in Post.objects.iterator():
+        SearchEntry.objects.bulk_create(
+            SearchEntry(term=term, post_id=post.pk, weight=weight)
+            for term, weight in post_terms(
+                post, comments.get(post.pk, ())
+            ).items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('weight', models.IntegerField(default=0, verbose_name='Вес')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='posts.Post', verbose_name='Заметка')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_entry'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
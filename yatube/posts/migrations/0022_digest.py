@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0021_post_image_content_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Digest',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='digest', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+                ('sent_until', models.DateTimeField(verbose_name='Отправлены заметки по')),
+            ],
+            options={
+                'verbose_name': 'Дайджест подписок',
+                'verbose_name_plural': 'Дайджесты подписок',
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import ContentAddressedStorage
+
 from .validators import validate_not_empty
 
 User = get_user_model()
@@ -44,10 +46,14 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         related_name='group_list'
     )
+    # Одинаковые картинки хранятся одним файлом (core.storage), индекс
+    # нужен для подсчета ссылок на файл (posts.media)
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True,
     )
 
     def __str__(self):
@@ -56,6 +62,16 @@ class Post(models.Model):
     class Meta:
         verbose_name = 'Заметка'
         verbose_name_plural = 'Заметки'
+        ordering = ('-pub_date', '-pk')
+        # Индексы под сортировку лент (pub_date, id) и ключи курсора
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -83,6 +99,10 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -106,3 +126,99 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name="unique_following")
         ]
+        # Подписчики автора (раскладка ленты, счетчики) без обращения
+        # к таблице: индекс покрывает запрос
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Заметка',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry')
+        ]
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField('Заметок', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class PostCounters(models.Model):
+    post = models.OneToOneField(
+        Post,
+        verbose_name='Заметка',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики заметки'
+        verbose_name_plural = 'Счетчики заметок'
+
+
+class Digest(models.Model):
+    user = models.OneToOneField(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='digest'
+    )
+    # Заметки, опубликованные до этого момента, в письмах уже были
+    sent_until = models.DateTimeField('Отправлены заметки по')
+
+    class Meta:
+        verbose_name = 'Дайджест подписок'
+        verbose_name_plural = 'Дайджесты подписок'
+
+
+class SearchEntry(models.Model):
+    term = models.CharField('Слово', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Заметка',
+        on_delete=models.CASCADE,
+        related_name='search_entries'
+    )
+    weight = models.IntegerField('Вес', default=0)
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'post'],
+                                    name='unique_search_entry')
+        ]
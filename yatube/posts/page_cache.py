@@ -0,0 +1,163 @@
+"""
+Кэш целых страниц для анонимных посетителей.
+
+Страница кэшируется по пути с параметрами запроса и хранит версии своих
+лент (posts.feed_cache) на момент сохранения. Сигналы Post, Comment и
+Follow увеличивают версии, и страница устаревает. Устаревшую страницу
+пересобирает один запрос, остальные в это время получают прежнюю
+(stale-while-revalidate), но не дольше PAGE_CACHE_STALE секунд.
+
+Кроме ленты адреса, view может добавить ленты, которые известны только
+после запроса к базе (depend): страница заметки показывает счетчики
+автора и зависит от его профиля. Такие ленты запоминаются в записи, и
+при пересборке их версии читаются до view, как и версия ленты адреса.
+
+Запросы с cookie сессии, ответы с cookie и ответы, в которые попал
+CSRF-токен, не кэшируются: их содержимое зависит от посетителя.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from core import metrics
+
+from . import feed_cache
+
+PREFIX = 'pagecache:v2:'
+LOCK_TIMEOUT = 30
+
+# имя адреса -> вид ленты и аргумент адреса с ее ключом
+PAGES = {
+    'posts:index': ('global', None),
+    'posts:group_list': ('group', 'gr'),
+    'posts:profile': ('profile', 'username'),
+    'posts:post_detail': ('post', 'post_id'),
+    'posts:post_comments': ('post', 'post_id'),
+}
+
+
+def page_feed(request):
+    """Лента, от которой зависит страница, или None для прочих адресов."""
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if match.view_name not in PAGES:
+        return None
+    kind, argument = PAGES[match.view_name]
+    return feed_cache.feed_id(
+        kind, match.kwargs[argument] if argument else None
+    )
+
+
+def depend(request, *feeds):
+    """
+    Добавляет ленты, от которых зависит кэшируемая страница. Версии лент,
+    не известных по прежней записи, читаются при вызове — до чтения
+    данных, которые от них зависят.
+    """
+    versions = getattr(request, 'page_versions', None)
+    if versions is None:
+        return
+    new = [feed for feed in feeds if feed not in versions]
+    versions.update(zip(new, feed_cache.get_versions(new)))
+
+
+def is_anonymous(request):
+    return (
+        request.method == 'GET'
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def storable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def cache_key(request):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PREFIX + digest
+
+
+def from_entry(entry, age):
+    response = entry['response']
+    response['Age'] = int(age)
+    return response
+
+
+def public(response, state):
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.PAGE_CACHE_TIMEOUT,
+        stale_while_revalidate=settings.PAGE_CACHE_STALE,
+    )
+    response['X-Page-Cache'] = state
+    metrics.count_cache(state != 'miss')
+    return response
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Отдает анонимным посетителям сохраненные страницы лент и заметок,
+    минуя сессии, view, запросы к базе и шаблоны.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        feed = page_feed(request)
+        if feed is None:
+            return self.get_response(request)
+        if not is_anonymous(request):
+            response = self.get_response(request)
+            patch_vary_headers(response, ('Cookie',))
+            patch_cache_control(response, private=True)
+            return response
+        return self.cached(request, feed)
+
+    def cached(self, request, feed):
+        key = cache_key(request)
+        feeds = list(feed_cache.dependencies(feed))
+        entry = cache.get(key)
+        extra = entry['feeds'] if entry is not None else []
+        versions = feed_cache.get_versions(feeds + extra)
+        if entry is not None:
+            age = time.time() - entry['stored']
+            if (
+                entry['versions'] == versions
+                and age < settings.PAGE_CACHE_TIMEOUT
+            ):
+                return public(from_entry(entry, age), 'hit')
+            if not cache.add(key + ':lock', 1, LOCK_TIMEOUT):
+                # Страницу уже пересобирает другой запрос
+                return public(from_entry(entry, age), 'stale')
+        request.page_versions = dict(zip(extra, versions[len(feeds):]))
+        try:
+            response = self.get_response(request)
+            patch_vary_headers(response, ('Cookie',))
+            if not storable(request, response):
+                return response
+            cache.set(key, {
+                'feeds': list(request.page_versions),
+                'versions': (
+                    versions[:len(feeds)]
+                    + list(request.page_versions.values())
+                ),
+                'stored': time.time(),
+                'response': response,
+            }, settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE)
+        finally:
+            if entry is not None:
+                cache.delete(key + ':lock')
+        return public(response, 'miss')
@@ -0,0 +1,268 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import feed_cache
+
+ELLIPSIS = '…'
+
+
+class CountedPage(Page):
+    @property
+    def elided_page_range(self):
+        return self.paginator.get_elided_page_range(self.number)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator, который берет COUNT(*) ленты feed из кэша.
+
+    Ключ строится из версий ленты (posts.feed_cache): создание и удаление
+    заметок увеличивают версию, и число пересчитывается одним запросом.
+    Версии растут и от правок и комментариев — лишний пересчет дешевле,
+    чем отдельные счетчики для каждой ленты. Без feed число не кэшируется.
+    """
+    ELLIPSIS = ELLIPSIS
+    on_each_side = 2
+    on_ends = 1
+
+    def __init__(self, object_list, per_page, feed=None, **kwargs):
+        self.feed = feed
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.feed is None:
+            return super().count
+        key = feed_cache.count_key(self.feed)
+        value = cache.get(key)
+        if value is None:
+            value = super().count
+            cache.set(key, value, settings.FEED_CACHE_TIMEOUT)
+        return value
+
+    def get_elided_page_range(self, number):
+        """
+        Номера страниц вокруг текущей и по краям ленты, пропуски
+        обозначены ELLIPSIS: ссылок всегда не больше десятка.
+        """
+        number = self.validate_number(number)
+        last = self.num_pages
+        if last <= (self.on_each_side + self.on_ends) * 2 + 1:
+            return list(self.page_range)
+        left = max(number - self.on_each_side, 1)
+        right = min(number + self.on_each_side, last)
+        pages = []
+        if left > self.on_ends + 1:
+            pages.extend([*range(1, self.on_ends + 1), ELLIPSIS])
+        else:
+            left = 1
+        if right < last - self.on_ends:
+            tail = [ELLIPSIS, *range(last - self.on_ends + 1, last + 1)]
+        else:
+            right, tail = last, []
+        pages.extend(range(left, right + 1))
+        return pages + tail
+
+    def _get_page(self, *args, **kwargs):
+        return CountedPage(*args, **kwargs)
+
+
+class KeysetRows(Sequence):
+    """
+    Заметки страницы по курсору. Запрос выполняется при первом обращении
+    к строкам или ссылкам на соседние страницы, так что закэшированный
+    фрагмент ленты ({% feedcache %}) обходится без него. Пустая выборка
+    с fallback заменяется первой страницей.
+    """
+
+    def __init__(self, paginator, cursor=None, reverse=False,
+                 fallback=True):
+        self.paginator = paginator
+        self.cursor = cursor
+        self.reverse = reverse
+        self.fallback = fallback
+
+    @cached_property
+    def _result(self):
+        result = self.paginator.fetch(self.cursor, self.reverse)
+        if not result[0] and self.cursor is not None and self.fallback:
+            result = self.paginator.fetch(None, reverse=False)
+        return result
+
+    def __getitem__(self, index):
+        return self._result[0][index]
+
+    def __len__(self):
+        return len(self._result[0])
+
+    def has_previous(self):
+        return self._result[1]
+
+    def has_next(self):
+        return self._result[2]
+
+    def previous_cursor(self):
+        if self and self.has_previous():
+            return self.paginator.encode_cursor(self[0])
+        return None
+
+    def next_cursor(self):
+        if self and self.has_next():
+            return self.paginator.encode_cursor(self[-1])
+        return None
+
+
+class KeysetPaginator(CachedCountPaginator):
+    """
+    Постраничный вывод по курсору (keyset pagination).
+
+    Страница выбирается условием по ключам сортировки, а не OFFSET,
+    поэтому выборка стоит O(per_page) на любой глубине и не требует
+    COUNT(*). Порядок стабилен: последний ключ (обычно pk) разрешает
+    совпадения по дате. Номер страницы (?page=N) поддерживается как
+    запасной вариант для старых ссылок; только он считает COUNT(*).
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk'), **kwargs):
+        self.ordering = tuple(ordering)
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+
+    def get_page(self, number=None, after=None, before=None, strict=False):
+        """
+        Возвращает страницу по курсору after/before, по номеру страницы
+        или первую страницу, если ничего не передано. Битый курсор или
+        пустая страница ведут на первую; со strict=True битый курсор
+        вызывает InvalidPage, а за концом ленты страница пустая — так
+        подгрузка фрагментом не повторит уже показанное.
+        """
+        if number is not None and after is None and before is None:
+            page = super().get_page(number)
+            page.is_keyset = False
+            return page
+        cursor = after or before
+        decoded = self.decode_cursor(cursor)
+        if strict and cursor and decoded is None:
+            raise InvalidPage('Неверный курсор')
+        rows = KeysetRows(
+            self, decoded,
+            reverse=decoded is not None and not after,
+            fallback=not strict,
+        )
+        page = Page(rows, 1 if decoded is None else None, self)
+        page.is_keyset = True
+        page.has_previous = rows.has_previous
+        page.has_next = rows.has_next
+        page.previous_cursor = rows.previous_cursor
+        page.next_cursor = rows.next_cursor
+        return page
+
+    def get_page_from_request(self, request, strict=False):
+        return self.get_page(
+            request.GET.get('page'),
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            strict=strict,
+        )
+
+    def fetch(self, cursor, reverse):
+        """
+        Строки после курсора (reverse — до него) и есть ли страницы
+        до и после: (строки, has_previous, has_next).
+        """
+        queryset = self.object_list
+        if cursor is not None:
+            queryset = queryset.filter(self._seek(cursor, reverse))
+        if reverse:
+            queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            return rows, has_more, True
+        return rows, cursor is not None, has_more
+
+    def _keys(self):
+        for field in self.ordering:
+            yield field.lstrip('-'), field.startswith('-')
+
+    def _seek(self, values, reverse):
+        """
+        Условие «строго после курсора» для лексикографического порядка
+        (a, b, ...): a < x OR (a = x AND b < y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self._keys(), values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, obj):
+        values = []
+        for name, _ in self._keys():
+            value = getattr(obj, name)
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Разбирает курсор; для испорченного курсора возвращает None."""
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        parsed = [
+            self._parse_key(name, value)
+            for (name, _), value in zip(self._keys(), values)
+        ]
+        if None in parsed:
+            return None
+        return parsed
+
+    def _parse_key(self, name, value):
+        """Приводит значение ключа из курсора к типу поля модели."""
+        opts = self.object_list.model._meta
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            # Ключ по аннотации: JSON уже хранит число
+            return value
+        try:
+            return field.to_python(value)
+        except (TypeError, ValidationError):
+            return None
+
+
+def paginate(request, object_list, ordering=('-pub_date', '-pk'),
+             feed=None, per_page=None, strict=False):
+    """
+    Страница ленты для запроса: курсор, ?page=N или первая. feed —
+    идентичность ленты из posts.feed_cache для кэша числа заметок.
+    """
+    paginator = KeysetPaginator(
+        object_list, per_page or settings.PAGE_SIZE,
+        ordering=ordering, feed=feed,
+    )
+    return paginator.get_page_from_request(request, strict=strict)
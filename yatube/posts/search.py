@@ -0,0 +1,129 @@
+"""
+Поиск по заметкам и комментариям.
+
+Инвертированный индекс хранится в таблице SearchEntry: слово, заметка и
+вес — сколько раз слово встречается в тексте заметки (с весом
+TEXT_WEIGHT) и в комментариях к ней. Индекс обычной таблицей работает на
+любой базе. Он обновляется сигналами: новый комментарий добавляет веса
+своих слов, удаленный вычитает, правка заметки пересобирает записи
+только этой заметки.
+
+Запрос находит заметки, в которых есть все слова запроса (слово запроса
+совпадает с началом слова в индексе), и ранжирует их по сумме весов.
+"""
+import re
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum
+
+from .models import Comment, Post, SearchEntry
+
+TEXT_WEIGHT = 2
+MAX_TERM_LENGTH = SearchEntry._meta.get_field('term').max_length
+MAX_QUERY_TERMS = 5
+WORD_RE = re.compile(r'\w{2,}')
+
+
+def terms(text):
+    """Слова текста в нижнем регистре с числом повторов."""
+    return Counter(
+        word[:MAX_TERM_LENGTH].replace('ё', 'е')
+        for word in WORD_RE.findall(text.lower())
+    )
+
+
+def post_terms(post, comments=()):
+    weights = Counter()
+    for term, count in terms(post.text).items():
+        weights[term] += count * TEXT_WEIGHT
+    for text in comments:
+        weights.update(terms(text))
+    return weights
+
+
+@transaction.atomic
+def index_post(post):
+    """Пересобирает записи индекса одной заметки."""
+    SearchEntry.objects.filter(post=post).delete()
+    weights = post_terms(
+        post,
+        Comment.objects.filter(post=post).values_list('text', flat=True),
+    )
+    SearchEntry.objects.bulk_create(
+        SearchEntry(term=term, post=post, weight=weight)
+        for term, weight in weights.items()
+    )
+
+
+@transaction.atomic
+def add_comment(comment):
+    """Добавляет веса слов нового комментария."""
+    weights = terms(comment.text)
+    entries = SearchEntry.objects.filter(post=comment.post_id)
+    existing = set(entries.filter(
+        term__in=weights
+    ).values_list('term', flat=True))
+    _shift(entries, {t: w for t, w in weights.items() if t in existing})
+    SearchEntry.objects.bulk_create(
+        SearchEntry(term=term, post_id=comment.post_id, weight=weight)
+        for term, weight in weights.items() if term not in existing
+    )
+
+
+@transaction.atomic
+def remove_comment(comment):
+    """
+    Вычитает веса слов удаленного комментария. Записи только меняются
+    и удаляются: при каскадном удалении заметки новых строк не будет.
+    """
+    weights = terms(comment.text)
+    entries = SearchEntry.objects.filter(post=comment.post_id)
+    _shift(entries, {term: -weight for term, weight in weights.items()})
+    entries.filter(term__in=weights, weight__lte=0).delete()
+
+
+def _shift(entries, deltas):
+    # Один UPDATE на каждое различное значение сдвига, а не на слово
+    by_delta = {}
+    for term, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(term)
+    for delta, group in by_delta.items():
+        entries.filter(term__in=group).update(weight=F('weight') + delta)
+
+
+def _match(term):
+    # Диапазон вместо LIKE: поиск по началу слова идет по индексу
+    return Q(term__gte=term, term__lt=term + '\uffff')
+
+
+def posts_matching(query):
+    """
+    Заметки, содержащие все слова запроса, с аннотацией rank.
+    Для пустого запроса возвращает пустую выборку.
+    """
+    words = list(terms(query))[:MAX_QUERY_TERMS]
+    if not words:
+        return Post.objects.none()
+    posts = Post.objects.all()
+    for word in words:
+        posts = posts.filter(
+            pk__in=SearchEntry.objects.filter(_match(word)).values('post')
+        )
+    rank = SearchEntry.objects.filter(
+        reduce(or_, map(_match, words)), post=OuterRef('pk')
+    ).order_by().values('post').annotate(rank=Sum('weight')).values('rank')
+    return posts.annotate(
+        rank=Subquery(rank, output_field=IntegerField())
+    )
+
+
+def rebuild():
+    """Пересобирает весь индекс, возвращает число заметок."""
+    count = 0
+    for post in Post.objects.iterator():
+        index_post(post)
+        count += 1
+    return count
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, digest, feed_cache, media, search, timeline
+from .models import Comment, Follow, Post, PostCounters, User, UserCounters
+
+
+@receiver(post_save, sender=User)
+def count_user_created(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post_created(sender, instance, created, **kwargs):
+    if created:
+        PostCounters.objects.create(post=instance)
+        counters.adjust_user(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_post_deleted(sender, instance, **kwargs):
+    counters.adjust_user(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust_user(instance.user_id, following_count=1)
+        counters.adjust_user(instance.author_id, followers_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_follow_deleted(sender, instance, **kwargs):
+    counters.adjust_user(instance.user_id, following_count=-1)
+    counters.adjust_user(instance.author_id, followers_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust_post(instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_deleted(sender, instance, **kwargs):
+    counters.adjust_post(instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.fan_out_post.delay(
+            instance.pk, key=f'fan_out:{instance.pk}'
+        )
+
+
+@receiver(post_save, sender=Post)
+def schedule_digest(sender, instance, created, **kwargs):
+    if created and settings.DIGEST_ENABLED:
+        digest.schedule()
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    # При смене группы пост пропадает из старой ленты группы, при смене
+    # картинки прежний файл освобождается
+    previous = None
+    if instance.pk is not None:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group__slug', 'image'
+        ).first()
+    instance._previous_group_slug, instance._previous_image = (
+        previous or (None, None)
+    )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if previous != instance.image.name:
+        media.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    feed_cache.bump_for_post(
+        instance, getattr(instance, '_previous_group_slug', None)
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    feed_cache.bump_for_post(instance.post)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        timeline.add_author(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if timeline.is_enabled():
+        timeline.remove_author(instance.user, instance.author)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    # Профили обоих показывают счетчики подписок
+    feed_cache.bump(
+        feed_cache.feed_id('follow', instance.user_id),
+        feed_cache.feed_id('profile', instance.user.username),
+        feed_cache.feed_id('profile', instance.author.username),
+    )
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, **kwargs):
+    if created:
+        search.add_comment(instance)
+    else:
+        search.index_post(instance.post)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove_comment(instance)
@@ -0,0 +1,43 @@
+from django import template
+
+from .. import feed_cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, key):
+        self.nodelist = nodelist
+        self.key = key
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+        value = feed_cache.get_fragment(key)
+        if value is None:
+            value = self.nodelist.render(context)
+            feed_cache.set_fragment(key, value)
+        return value
+
+
+@register.tag
+def feedcache(parser, token):
+    """
+    Кэширует фрагмент ленты до изменения ее версии. Ключ с версиями
+    ленты строит представление (posts.views.feed_page) до запроса
+    заметок: если версия вырастет между запросом и выводом, фрагмент
+    ляжет под прежней версией и не будет отдан.
+
+    Использование::
+
+        {% feedcache page_obj.fragment_key %} ... {% endfeedcache %}
+    """
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} принимает ключ фрагмента'
+        )
+    return FeedCacheNode(nodelist, parser.compile_filter(bits[1]))
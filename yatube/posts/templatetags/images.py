@@ -0,0 +1,24 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail_url(image, spec):
+    """Адрес миниатюры из манифеста: {{ post.image|thumbnail_url:'card' }}."""
+    return thumbnails.url(image, spec)
+
+
+@register.inclusion_tag('includes/picture.html')
+def picture(image, spec, sizes='100vw', css_class=''):
+    """
+    <picture> с вариантами картинки под ширину экрана:
+    {% picture post.image 'card' sizes='(min-width: 992px) 720px, 100vw' %}
+    """
+    return {
+        'sizes': sizes,
+        'css_class': css_class,
+        **thumbnails.picture(image, spec),
+    }
@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (Comment, Follow, Post, PostCounters, User,
+                      UserCounters)
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def user_counters(self, user):
+        counters = UserCounters.objects.get(user=user)
+        return (
+            counters.posts_count,
+            counters.followers_count,
+            counters.following_count,
+        )
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются при создании и удалении записей."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            text='Коммент', author=self.reader, post=post
+        )
+        self.assertEqual(self.user_counters(self.author), (1, 1, 0))
+        self.assertEqual(self.user_counters(self.reader), (0, 0, 1))
+        self.assertEqual(
+            PostCounters.objects.get(post=post).comments_count, 1
+        )
+
+        comment.delete()
+        follow.delete()
+        self.assertEqual(
+            PostCounters.objects.get(post=post).comments_count, 0
+        )
+        self.assertEqual(self.user_counters(self.reader), (0, 0, 0))
+        post.delete()
+        self.assertEqual(self.user_counters(self.author), (0, 0, 0))
+
+    def test_post_delete_cascades_comments(self):
+        """Удаление поста с комментариями не оставляет висячих счетчиков."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(text='Коммент', author=self.reader, post=post)
+        post.delete()
+        self.assertFalse(PostCounters.objects.exists())
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет рассинхронизацию счетчиков."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(text='Коммент', author=self.reader, post=post)
+        UserCounters.objects.filter(user=self.author).update(posts_count=7)
+        PostCounters.objects.all().delete()
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('пользователей 1, заметок 1', out.getvalue())
+        self.assertEqual(self.user_counters(self.author), (1, 0, 0))
+        self.assertEqual(
+            PostCounters.objects.get(post=post).comments_count, 1
+        )
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Task
+
+from .. import checks, digest
+from ..models import Follow, Post, User
+
+TEMP_EMAIL_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class DigestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.leo = User.objects.create_user(username='leo')
+        cls.ann = User.objects.create_user(username='ann')
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        cls.fan = User.objects.create_user(
+            username='fan', email='fan@example.com'
+        )
+        cls.silent = User.objects.create_user(username='silent')
+        for user, author in (
+            (cls.reader, cls.leo), (cls.reader, cls.ann),
+            (cls.fan, cls.ann), (cls.silent, cls.leo),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_EMAIL_DIR, ignore_errors=True)
+
+    def publish(self):
+        Post.objects.create(text='Заметка Льва', author=self.leo)
+        Post.objects.create(text='Заметка Анны', author=self.ann)
+
+    def test_one_email_per_follower(self):
+        """Подписчик с почтой получает одно письмо со всеми заметками."""
+        self.publish()
+        self.assertEqual(digest.send(), 2)
+        messages = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(messages), {'reader@example.com',
+                                         'fan@example.com'})
+        body = messages['reader@example.com'].body
+        self.assertIn('Заметка Льва', body)
+        self.assertLess(body.index('Заметка Анны'), body.index('Заметка Льва'))
+        self.assertNotIn('Заметка Льва', messages['fan@example.com'].body)
+        # Отправленные заметки повторно не приходят
+        self.assertEqual(digest.send(), 0)
+
+    def test_retry_skips_sent_batches(self):
+        """Повтор рассылки с тем же моментом не шлет письма снова."""
+        self.publish()
+        until = timezone.now()
+        digest.mark_sent([self.reader.pk], until)
+        self.assertEqual(digest.send(until), 1)
+        self.assertEqual(mail.outbox[0].to, ['fan@example.com'])
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+        EMAIL_FILE_PATH=TEMP_EMAIL_DIR,
+        DIGEST_BATCH_SIZE=1,
+    )
+    def test_file_backend_single_connection(self):
+        """Все пачки рассылки идут через одно соединение — один файл."""
+        self.publish()
+        with mock.patch.object(digest, 'heartbeat') as heartbeat:
+            self.assertEqual(digest.send(), 2)
+        # Срок задачи продлевается перед каждой пачкой
+        self.assertEqual(heartbeat.call_count, 2)
+        files = os.listdir(TEMP_EMAIL_DIR)
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(TEMP_EMAIL_DIR, files[0])) as sent:
+            self.assertEqual(sent.read().count('Subject:'), 2)
+
+    @override_settings(TASKS_EAGER=False, DIGEST_ENABLED=True)
+    def test_scheduled_once_per_window(self):
+        """Заметки одного окна ставят одну рассылку на конец окна."""
+        self.publish()
+        task = Task.objects.get(name='posts.digest.send_digests')
+        until = digest.window_end(timezone.now())
+        self.assertIn(until.isoformat(), task.args)
+        self.assertLessEqual(task.run_at, until + timedelta(seconds=1))
+
+    @override_settings(DIGEST_ENABLED=True, SITE_URL='')
+    def test_site_url_required(self):
+        """Включенные дайджесты без SITE_URL не проходят проверку."""
+        self.assertEqual(
+            [error.id for error in checks.digest_site_url(None)],
+            ['posts.E001'],
+        )
+        with self.settings(SITE_URL='https://yatube.example'):
+            self.assertEqual(checks.digest_site_url(None), [])
+
+    def test_rate_limiter(self):
+        """Ограничитель выдерживает среднюю скорость писем."""
+        now = [0.0]
+        limiter = digest.RateLimiter(
+            10, clock=lambda: now[0],
+            sleep=lambda delay: now.__setitem__(0, now[0] + delay),
+        )
+        for _ in range(3):
+            limiter.wait(5)
+        self.assertEqual(now[0], 1.0)
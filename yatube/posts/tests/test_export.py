@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import export
+from ..models import Follow, Group, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        User.objects.bulk_create(
+            User(username=f'user{i}') for i in range(4)
+        )
+        users = list(User.objects.order_by('pk'))
+        Follow.objects.bulk_create(
+            Follow(user=users[0], author=author) for author in users[1:]
+        )
+
+    def test_rows_use_iterator_chunks(self):
+        """Строки читаются пачками по возрастанию id."""
+        ids = list(Follow.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        with self.assertNumQueries(1):
+            rows = list(export.rows('follows', chunk_size=1))
+        self.assertEqual([row[0] for row in rows], ids)
+        self.assertEqual(
+            [row[0] for row in export.rows('follows', after=ids[0])],
+            ids[1:],
+        )
+
+    def test_command_writes_file(self):
+        """Команда пишет выгрузку в файл построчно."""
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            call_command('export_data', 'groups', output=path)
+            with open(path, encoding='utf-8') as output:
+                rows = [json.loads(line) for line in output]
+        finally:
+            os.remove(path)
+        self.assertEqual(rows, [{
+            'id': self.group.pk, 'title': 'Группа', 'slug': 'group',
+            'description': 'Описание',
+        }])
+
+    def test_command_writes_stdout(self):
+        """Без --output выгрузка идет в stdout команды."""
+        out = StringIO()
+        call_command('export_data', 'groups', stdout=out)
+        self.assertEqual(
+            json.loads(out.getvalue())['slug'], self.group.slug
+        )
+        self.assertFalse(out.closed)
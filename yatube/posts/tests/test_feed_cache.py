@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import feed_cache, views
+from ..models import Comment, Follow, Group, Post, User
+from ..paginator import KeysetPaginator
+
+MAIN = reverse('posts:index')
+FOLLOW_INDEX = reverse('posts:follow_index')
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.GROUP_LIST = reverse('posts:group_list', args=[cls.group.slug])
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_new_post_is_visible_at_once(self):
+        """Новый пост виден в ленте сразу, без ожидания TTL."""
+        self.client.get(MAIN)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertContains(self.client.get(MAIN), 'Свежий пост')
+
+    def test_group_change_invalidates_old_group(self):
+        """Смена группы сбрасывает ленту старой группы."""
+        post = Post.objects.create(
+            text='Переезжающий пост', author=self.author, group=self.group
+        )
+        self.assertContains(self.client.get(self.GROUP_LIST), post.text)
+        post.group = self.other_group
+        post.save()
+        self.assertNotContains(self.client.get(self.GROUP_LIST), post.text)
+
+    def test_follow_feed_is_per_user(self):
+        """Лента подписок кэшируется для каждого пользователя отдельно."""
+        Post.objects.create(text='Пост автора', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.client.get(FOLLOW_INDEX), 'Пост автора')
+        stranger = User.objects.create_user(username='stranger')
+        self.client.force_login(stranger)
+        self.assertNotContains(self.client.get(FOLLOW_INDEX), 'Пост автора')
+
+    def test_comment_bumps_version_and_stats_count(self):
+        """Комментарий сбрасывает версию ленты, счетчики считают обращения."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        feed_cache.reset_stats()
+        with mock.patch.object(feed_cache, 'STATS_SAMPLE_EVERY', 1):
+            self.client.get(MAIN)
+            self.client.get(MAIN)
+        version = feed_cache.get_versions(['global'])
+        Comment.objects.create(text='Коммент', author=self.reader, post=post)
+        self.assertNotEqual(feed_cache.get_versions(['global']), version)
+        stats = feed_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_fragment_key_taken_before_query(self):
+        """Правка между запросом заметок и выводом не попадает в кэш."""
+        Post.objects.create(text='Старый пост', author=self.author)
+        paginate = views.paginate
+
+        def bump_after_query(*args, **kwargs):
+            page = paginate(*args, **kwargs)
+            list(page)
+            Post.objects.create(text='Новый пост', author=self.author)
+            return page
+
+        with mock.patch.object(views, 'paginate', bump_after_query):
+            self.assertNotContains(self.client.get(MAIN), 'Новый пост')
+        self.assertContains(self.client.get(MAIN), 'Новый пост')
+
+    def test_cached_fragment_skips_query(self):
+        """Закэшированный фрагмент ленты выводится без выборки заметок."""
+        Post.objects.create(text='Пост', author=self.author)
+        with mock.patch.object(
+            KeysetPaginator, 'fetch', autospec=True,
+            side_effect=KeysetPaginator.fetch,
+        ) as fetch:
+            self.client.get(MAIN)
+            self.assertContains(self.client.get(MAIN), 'Пост')
+        self.assertEqual(fetch.call_count, 1)
@@ -1,10 +1,12 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..forms import PostForm
 from ..models import Comment, Group, Post, User
@@ -98,10 +100,12 @@ class PostCreateFormTests(TestCase):
         # Проверяем, увеличилось ли число постов
         self.assertEqual(Post.objects.count(), posts_count + 1)
 
+        # Картинка хранится под хэшем содержимого
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст №2',
-                image='posts/small.gif'
+                image__startswith='posts/',
+                image__endswith='.gif',
             ).last()
         )
         self.assertTrue(
@@ -142,3 +146,72 @@ class PostCreateFormTests(TestCase):
                 description='Тестовое описание',
             ).exists()
         )
+
+
+def image_upload(size=(10, 10), image_format='PNG', name='image.png'):
+    content = BytesIO()
+    Image.new('RGB', size).save(content, image_format)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def form(self, upload):
+        return PostForm({'text': 'Текст'}, {'image': upload})
+
+    def test_header_limits(self):
+        """Картинка отклоняется по заголовку: размеры, пиксели, формат."""
+        cases = {
+            'side': image_upload((60, 10)),
+            'pixels': image_upload((40, 40)),
+            'format': image_upload(image_format='BMP', name='image.bmp'),
+            'not image': SimpleUploadedFile('image.png', b'not an image'),
+        }
+        with override_settings(IMAGE_UPLOAD_MAX_SIDE=50,
+                               IMAGE_UPLOAD_MAX_PIXELS=1000):
+            for case, upload in cases.items():
+                with self.subTest(case=case):
+                    self.assertIn('image', self.form(upload).errors)
+            form = self.form(image_upload((20, 20)))
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['image'].content_type,
+                         'image/png')
+
+    @override_settings(UPLOAD_MAX_BYTES=100)
+    def test_byte_limit_streamed_upload(self):
+        """
+        Файл больше UPLOAD_MAX_BYTES отклоняется, а время загрузки видно
+        в Server-Timing.
+        """
+        response = self.authorized_client.post(CREATE, {
+            'text': 'Текст', 'image': image_upload((200, 200)),
+        })
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 100\xa0байт.'
+        )
+        self.assertIn('upload;dur=', response['Server-Timing'])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(UPLOAD_MAX_BYTES=100)
+    def test_truncated_upload_reports_size(self):
+        """Обрезанный при загрузке файл отклоняется по размеру."""
+        upload = image_upload((200, 200))
+        upload.file.truncate(100)
+        upload.size = 1000
+        self.assertEqual(
+            self.form(upload).errors['image'], ['Файл больше 100\xa0байт.']
+        )
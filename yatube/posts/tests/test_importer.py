@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import counters, search
+from ..importer import Importer, MalformedRow
+from ..models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ImporterTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.mkdtemp()
+        User.objects.create_user(username='existing')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, name, rows):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as source:
+            for row in rows:
+                # Строка пишется как есть: так задается битый JSON
+                if not isinstance(row, str):
+                    row = json.dumps(row, ensure_ascii=False)
+                source.write(row + '\n')
+        return path
+
+    def test_import(self):
+        """Пачки с проверкой строк, связями по именам и картинками."""
+        with open(os.path.join(self.dir, 'cat.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+        run = Importer(images_dir=self.dir, batch_size=2)
+        run.groups(self.write('groups.ndjson', [
+            {'slug': 'cats', 'title': 'Кошки'},
+            {'slug': '', 'title': 'Без адреса'},
+        ]))
+        run.users(self.write('users.ndjson', [
+            {'username': 'leo'}, {'username': 'ann'},
+            {'username': 'existing'},
+        ]))
+        run.posts(self.write('posts.ndjson', [
+            {'author': 'leo', 'group': 'cats', 'text': 'Кошка на окне',
+             'pub_date': '2020-01-02T03:04:05+00:00', 'image': 'cat.gif',
+             'comments': [{'author': 'ann', 'text': 'Рыжая кошка'}]},
+            {'author': 'leo', 'text': ''},
+            {'author': 'nobody', 'text': 'Чужой пост'},
+            {'author': 'ann', 'text': 'Второй пост'},
+        ]))
+        run.follows(self.write('follows.ndjson', [
+            {'user': 'ann', 'author': 'leo'},
+            {'user': 'ann', 'author': 'ann'},
+        ]))
+        report = run.finish()
+        self.assertEqual(
+            dict(report.created),
+            {'groups': 1, 'users': 2, 'posts': 2, 'comments': 1,
+             'follows': 1},
+        )
+        self.assertEqual(len(report.errors), 5)
+        post = Post.objects.get(text='Кошка на окне')
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(
+            post.pub_date,
+            datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        )
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        self.assertEqual(Comment.objects.get(post=post).author.username, 'ann')
+        self.assertTrue(Follow.objects.filter(
+            user__username='ann', author__username='leo'
+        ).exists())
+        self.assertEqual(
+            list(search.posts_matching('рыжая')), [post]
+        )
+        leo = User.objects.get(username='leo')
+        self.assertEqual(counters.for_user(leo).posts_count, 1)
+        self.assertEqual(counters.for_user(leo).followers_count, 1)
+        self.assertFalse(leo.has_usable_password())
+        self.assertEqual(Group.objects.count(), 1)
+
+    def test_malformed_rows_found_before_import(self):
+        """Битая строка или строка не той формы находится до импорта."""
+        run = Importer()
+        cases = {
+            'posts:1: Expecting': ['{"author": "leo",'],
+            'posts:2: ожидался объект': [
+                {'author': 'leo', 'text': 'Пост'}, ['leo', 'Пост'],
+            ],
+            'posts:1: pub_date: ожидалась строка': [
+                {'author': 'leo', 'text': 'Пост', 'pub_date': 20200102},
+            ],
+            'posts:1: comments: ожидался список': [
+                {'author': 'leo', 'text': 'Пост', 'comments': 'Ура'},
+            ],
+            'posts:1: comments: ожидался объект': [
+                {'author': 'leo', 'text': 'Пост', 'comments': ['Ура']},
+            ],
+        }
+        for message, rows in cases.items():
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(MalformedRow, message):
+                    run.check('posts', self.write('posts.ndjson', rows))
+        with self.assertRaisesMessage(MalformedRow, 'follows:1'):
+            run.check('follows', self.write('follows.ndjson', [
+                {'user': 'leo', 'author': None},
+            ]))
+
+    def test_command_checks_all_files_first(self):
+        """Ошибка формы в одном файле не дает записать и остальные."""
+        users = self.write('users.ndjson', [{'username': 'leo'}])
+        posts = self.write('posts.ndjson', [['leo', 'Пост']])
+        with self.assertRaisesMessage(CommandError, 'posts:1'):
+            call_command('import_data', users=users, posts=posts)
+        self.assertFalse(User.objects.filter(username='leo').exists())
@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+from .. import media, thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\x4c\x01', b'\x44\x01')
+
+
+# Задачи при TASKS_EAGER выполняются в transaction.on_commit, поэтому
+# нужны настоящие транзакции
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ContentAddressedMediaTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, text, content=SMALL_GIF, name='small.gif'):
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': text,
+            'image': SimpleUploadedFile(name, content, 'image/gif'),
+        })
+        return Post.objects.get(text=text)
+
+    def test_same_bytes_share_file_and_thumbnails(self):
+        """Одинаковые картинки — один файл и одни миниатюры."""
+        first = self.create('Первая')
+        second = self.create('Вторая', name='meme.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertIsNotNone(thumbnails.manifest(first.image.name))
+        self.assertNotEqual(
+            self.create('Третья', OTHER_GIF).image.name, first.image.name
+        )
+
+    def test_file_removed_with_last_reference(self):
+        """Файл и миниатюры удаляются вместе с последней ссылкой."""
+        first = self.create('Первая')
+        second = self.create('Вторая')
+        name = first.image.name
+        variant = thumbnails.manifest(name)['card']['src']
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(variant))
+        self.assertIsNone(thumbnails.manifest(name))
+
+    def test_replaced_image_released(self):
+        """Замена картинки при правке освобождает прежний файл."""
+        post = self.create('Заметка')
+        name = post.image.name
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[post.pk]), {
+                'text': 'Заметка',
+                'image': SimpleUploadedFile('new.gif', OTHER_GIF),
+            }
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, name)
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(post.image.name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=False)
+class DelayedCollectTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, text):
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': text,
+            'image': SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        })
+        return Post.objects.get(text=text)
+
+    def test_reupload_during_delay_keeps_file(self):
+        """Файл, снова загруженный до срока удаления, остается."""
+        post = self.upload('Первая')
+        name = post.image.name
+        post.delete()
+        task = Task.objects.get(name='posts.media.collect')
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(self.upload('Вторая').image.name, name)
+        Task.objects.update(run_at=timezone.now())
+        tasks.run_pending()
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(Task.objects.filter(name=task.name).exists())
+
+    def test_pending_reupload_keeps_file(self):
+        """
+        Файл, загруженный снова после освобождения, остается, даже если
+        заметка с ним еще не сохранена; удаляет его следующее
+        освобождение.
+        """
+        post = self.upload('Первая')
+        name = post.image.name
+        post.delete()
+        self.assertEqual(post.image.storage.save(
+            'posts/small.gif', SimpleUploadedFile('small.gif', SMALL_GIF)
+        ), name)
+        Task.objects.update(run_at=timezone.now())
+        tasks.run_pending()
+        self.assertTrue(default_storage.exists(name))
+        media.release(name)
+        Task.objects.update(run_at=timezone.now())
+        tasks.run_pending()
+        self.assertFalse(default_storage.exists(name))
@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
 from ..models import Group, Post, User
@@ -53,3 +56,12 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post_model._meta.get_field(value).help_text, expected)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по составным индексам, а не полным сканом."""
+        out = StringIO()
+        call_command('feed_query_plans', stdout=out)
+        plans = out.getvalue()
+        for index in ('post_feed_idx', 'post_group_feed_idx',
+                      'post_author_feed_idx', 'comment_post_created_idx'):
+            self.assertIn(index, plans)
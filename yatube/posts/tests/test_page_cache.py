@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User
+from ..page_cache import cache_key
+
+MAIN = reverse('posts:index')
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Первый пост', author=cls.author)
+        cls.POST_PAGE = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.PROFILE = reverse('posts:profile', args=['auth'])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_hit_skips_view(self):
+        """Повторный анонимный запрос отдается из кэша без запросов."""
+        response = self.guest_client.get(MAIN)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(MAIN)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Первый пост')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('stale-while-revalidate', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_signals_invalidate_pages(self):
+        """Комментарий и подписка сбрасывают страницы, где они видны."""
+        self.guest_client.get(self.POST_PAGE)
+        self.guest_client.get(self.PROFILE)
+        reader = User.objects.create_user(username='reader')
+        Comment.objects.create(
+            text='Новый комментарий', author=reader, post=self.post
+        )
+        Follow.objects.create(user=reader, author=self.author)
+        response = self.guest_client.get(self.POST_PAGE)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Новый комментарий')
+        response = self.guest_client.get(self.PROFILE)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_new_post_refreshes_author_counters(self):
+        """Новый пост автора сбрасывает страницы его прежних заметок."""
+        self.guest_client.get(self.POST_PAGE)
+        response = self.guest_client.get(self.POST_PAGE)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Всего заметок автора: 1')
+        Post.objects.create(text='Второй пост', author=self.author)
+        response = self.guest_client.get(self.POST_PAGE)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Всего заметок автора: 2')
+
+    def test_stale_while_revalidate(self):
+        """Пока страницу пересобирает другой запрос, отдается прежняя."""
+        self.guest_client.get(MAIN)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        key = cache_key(RequestFactory().get(MAIN))
+        cache.add(key + ':lock', 1)
+        response = self.guest_client.get(MAIN)
+        self.assertEqual(response['X-Page-Cache'], 'stale')
+        self.assertNotContains(response, 'Свежий пост')
+        cache.delete(key + ':lock')
+        response = self.guest_client.get(MAIN)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Свежий пост')
+
+    def test_session_requests_not_cached(self):
+        """Запросы с сессией не кэшируются и помечаются private."""
+        client = Client()
+        client.force_login(self.author)
+        client.get(MAIN)
+        response = client.get(MAIN)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(
+            self.guest_client.get(MAIN)['X-Page-Cache'], 'miss'
+        )
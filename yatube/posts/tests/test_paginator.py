@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginator import ELLIPSIS, CachedCountPaginator, KeysetPaginator
+
+MAIN = reverse('posts:index')
+POSTS_COUNT = 25
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author)
+            for i in range(POSTS_COUNT)
+        )
+        # У всех постов почти одинаковая дата: порядок держится на pk
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def walk(self):
+        """Проходит ленту по курсорам next_cursor до конца."""
+        pks = []
+        response = self.guest_client.get(MAIN)
+        while True:
+            page_obj = response.context['page_obj']
+            pks.extend(post.pk for post in page_obj)
+            if not page_obj.next_cursor():
+                return pks
+            response = self.guest_client.get(
+                MAIN, {'after': page_obj.next_cursor()}
+            )
+
+    def test_cursor_walk_covers_feed_once(self):
+        """Проход по курсорам выдает все посты по одному разу."""
+        self.assertEqual(self.walk(), self.expected)
+
+    def test_new_post_does_not_shift_next_page(self):
+        """Новый пост не сдвигает следующую страницу."""
+        response = self.guest_client.get(MAIN)
+        cursor = response.context['page_obj'].next_cursor()
+        Post.objects.create(text='Свежий пост', author=self.author)
+        response = self.guest_client.get(MAIN, {'after': cursor})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[settings.PAGE_SIZE:settings.PAGE_SIZE * 2],
+        )
+
+    def test_before_cursor_returns_previous_page(self):
+        """Курсор before возвращает предыдущую страницу."""
+        response = self.guest_client.get(MAIN)
+        response = self.guest_client.get(
+            MAIN, {'after': response.context['page_obj'].next_cursor()}
+        )
+        response = self.guest_client.get(
+            MAIN, {'before': response.context['page_obj'].previous_cursor()}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(
+            [post.pk for post in page_obj],
+            self.expected[:settings.PAGE_SIZE],
+        )
+        self.assertIsNone(page_obj.previous_cursor())
+
+    def test_first_page_without_count(self):
+        """
+        Первая страница ленты обходится без COUNT(*), а выборка
+        откладывается до обращения к заметкам.
+        """
+        paginator = KeysetPaginator(Post.objects.all(), settings.PAGE_SIZE)
+        with self.assertNumQueries(0):
+            page_obj = paginator.get_page()
+        with self.assertNumQueries(1):
+            self.assertEqual(len(page_obj), settings.PAGE_SIZE)
+            self.assertTrue(page_obj.has_next())
+
+    def test_page_number_fallback_and_broken_cursor(self):
+        """Старые ссылки ?page=N работают, битый курсор ведет на начало."""
+        response = self.guest_client.get(MAIN, {'page': 3})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[settings.PAGE_SIZE * 2:],
+        )
+        response = self.guest_client.get(MAIN, {'after': 'не-курсор'})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[:settings.PAGE_SIZE],
+        )
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author)
+            for i in range(POSTS_COUNT)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self):
+        return CachedCountPaginator(
+            Post.objects.all(), settings.PAGE_SIZE, feed='global'
+        )
+
+    def test_count_cached_until_feed_changes(self):
+        """Число заметок берется из кэша до изменения ленты."""
+        self.assertEqual(self.paginator().count, POSTS_COUNT)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, POSTS_COUNT)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        self.assertEqual(self.paginator().count, POSTS_COUNT + 1)
+        Post.objects.filter(text='Свежий пост').get().delete()
+        self.assertEqual(self.paginator().count, POSTS_COUNT)
+
+    def test_elided_page_range(self):
+        """Ссылки только на соседние и крайние страницы."""
+        paginator = CachedCountPaginator(range(1000), 10)
+        self.assertEqual(
+            paginator.get_elided_page_range(50),
+            [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 100],
+        )
+        self.assertEqual(
+            paginator.get_elided_page_range(2),
+            [1, 2, 3, 4, ELLIPSIS, 100],
+        )
+        self.assertEqual(
+            paginator.get_elided_page_range(99),
+            [1, ELLIPSIS, 97, 98, 99, 100],
+        )
+        self.assertEqual(
+            CachedCountPaginator(range(30), 10).get_elided_page_range(1),
+            [1, 2, 3],
+        )
+
+    def test_page_links_window(self):
+        """Нумерованная страница выводит окно ссылок, а не все страницы."""
+        response = Client().get(MAIN, {'page': 2})
+        self.assertEqual(
+            response.context['page_obj'].elided_page_range, [1, 2, 3]
+        )
+        self.assertContains(response, 'page=3')
@@ -0,0 +1,87 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, SearchEntry, User
+
+SEARCH = reverse('posts:search')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.in_text = Post.objects.create(
+            text='Ёжик в тумане, ёжик у реки', author=cls.author,
+            group=cls.group,
+        )
+        cls.in_comment = Post.objects.create(
+            text='Про лошадь', author=cls.other
+        )
+        Comment.objects.create(
+            text='Там был ежик', author=cls.author, post=cls.in_comment
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def found(self, **params):
+        response = self.guest_client.get(SEARCH, params)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_search_ranks_text_above_comments(self):
+        """Совпадения в тексте заметки весят больше комментариев."""
+        self.assertEqual(
+            self.found(q='ежик'), [self.in_text.pk, self.in_comment.pk]
+        )
+
+    def test_all_words_and_prefix_match(self):
+        """Нужны все слова запроса, слово ищется по началу."""
+        self.assertEqual(self.found(q='еж тум'), [self.in_text.pk])
+        self.assertEqual(self.found(q='ежик слон'), [])
+
+    def test_group_and_author_filters(self):
+        """Фильтры по группе и автору сужают выдачу."""
+        self.assertEqual(
+            self.found(q='ежик', group=self.group.slug), [self.in_text.pk]
+        )
+        self.assertEqual(
+            self.found(q='ежик', author='other'), [self.in_comment.pk]
+        )
+
+    def test_index_follows_changes(self):
+        """Правка заметки и удаление комментария обновляют индекс."""
+        comment = Comment.objects.get(post=self.in_comment)
+        comment.delete()
+        self.assertEqual(self.found(q='ежик'), [self.in_text.pk])
+        post = Post.objects.get(pk=self.in_text.pk)
+        post.text = 'Про слона'
+        post.save()
+        self.assertEqual(self.found(q='ежик'), [])
+        self.assertEqual(self.found(q='слона'), [post.pk])
+        Post.objects.filter(pk=post.pk).delete()
+        self.assertFalse(SearchEntry.objects.filter(post=post.pk).exists())
+
+    def test_keyset_pages_keep_query(self):
+        """Курсорные страницы поиска сохраняют запрос в ссылках."""
+        Post.objects.bulk_create(
+            Post(text=f'Ежик номер {i}', author=self.author)
+            for i in range(15)
+        )
+        for post in Post.objects.filter(text__startswith='Ежик номер'):
+            post.save()
+        response = self.guest_client.get(SEARCH, {'q': 'ежик'})
+        page_obj = response.context['page_obj']
+        self.assertContains(response, 'q=%D0%B5%D0%B6%D0%B8%D0%BA')
+        response = self.guest_client.get(
+            SEARCH, {'q': 'ежик', 'after': page_obj.next_cursor()}
+        )
+        self.assertEqual(len(response.context['page_obj']), 7)
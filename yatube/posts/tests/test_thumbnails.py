@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core import tasks
+
+from .. import thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\x4c\x01', b'\x44\x01')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=False)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_create_post_pregenerates_thumbnail(self):
+        """Новая картинка получает миниатюру в фоне, шаблон берет ее."""
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': 'Заметка с картинкой',
+            'image': SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        })
+        post = Post.objects.get()
+        self.assertIsNone(thumbnails.manifest(post.image.name))
+        tasks.run_pending()
+        entry = thumbnails.manifest(post.image.name)['card']
+        self.assertTrue(default_storage.exists(entry['src']))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertContains(response, default_storage.url(entry['src']))
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_generation_refreshes_cached_pages(self):
+        """Готовые варианты сразу видны и в закэшированной странице."""
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': 'Заметка с картинкой',
+            'image': SimpleUploadedFile('other.gif', OTHER_GIF, 'image/gif'),
+        })
+        post = Post.objects.get()
+        address = reverse('posts:post_detail', args=[post.pk])
+        self.assertNotContains(Client().get(address), 'type="image/webp"')
+        tasks.run_pending()
+        self.assertContains(Client().get(address), 'type="image/webp"')
+
+    def test_variants_and_clean_original(self):
+        """
+        Исходник поворачивается по EXIF, теряет метаданные и уменьшается,
+        варианты не шире исходника.
+        """
+        exif = Image.Exif()
+        exif[0x0112] = 6  # повернуть на 90° по часовой
+        exif[0x010F] = 'Camera'
+        content = BytesIO()
+        Image.new('RGB', (400, 900)).save(content, 'JPEG', exif=exif)
+        name = default_storage.save(
+            'posts/photo.jpg', SimpleUploadedFile('photo.jpg',
+                                                  content.getvalue())
+        )
+        with mock.patch.object(thumbnails, 'ORIGINAL_MAX_SIDE', 800):
+            thumbnails.generate(name)
+        with default_storage.open(name) as source:
+            original = Image.open(source)
+            self.assertEqual(original.size, (800, 356))
+            self.assertNotIn('exif', original.info)
+        entry = thumbnails.manifest(name)['card']
+        for image_format in thumbnails.FORMATS:
+            with self.subTest(image_format=image_format):
+                self.assertEqual(
+                    [width for width, _ in entry[image_format]], [320, 640]
+                )
+        self.assertEqual(entry['src'], entry['jpeg'][-1][1])
+        image = Post(image=name).image
+        self.assertIn('640w', thumbnails.picture(image, 'card')['srcset'])
+
+    def test_transparency_kept_and_original_replaced_in_place(self):
+        """
+        Прозрачный PNG остается прозрачным в WebP, в JPEG прозрачное
+        белое; исходник переписывается под тем же именем.
+        """
+        content = BytesIO()
+        Image.new('RGBA', (700, 300), (255, 0, 0, 0)).save(content, 'PNG')
+        name = default_storage.save(
+            'posts/clear.png', SimpleUploadedFile('clear.png',
+                                                  content.getvalue())
+        )
+        with mock.patch.object(thumbnails, 'ORIGINAL_MAX_SIDE', 650):
+            thumbnails.generate(name)
+        # Ни копии с суффиксом, ни временного файла
+        directory = os.path.dirname(default_storage.path(name))
+        self.assertEqual(
+            [entry for entry in os.listdir(directory)
+             if entry.startswith('clear')],
+            ['clear.png'],
+        )
+        with default_storage.open(name) as source:
+            original = Image.open(source)
+            self.assertEqual((original.mode, original.width), ('RGBA', 650))
+        entry = thumbnails.manifest(name)['card']
+        with default_storage.open(entry['webp'][0][1]) as variant:
+            self.assertEqual(Image.open(variant).getpixel((0, 0))[3], 0)
+        with default_storage.open(entry['jpeg'][0][1]) as variant:
+            self.assertEqual(
+                Image.open(variant).convert('RGB').getpixel((0, 0)),
+                (255, 255, 255),
+            )
+
+    def test_backfill_command(self):
+        """
+        Команда создает миниатюры для картинок без них, закэшированные
+        страницы их сразу показывают.
+        """
+        name = default_storage.save(
+            'posts/old.gif', SimpleUploadedFile('old.gif', SMALL_GIF)
+        )
+        post = Post.objects.create(text='Старая заметка', author=self.user,
+                                   image=name)
+        address = reverse('posts:post_detail', args=[post.pk])
+        self.assertNotContains(Client().get(address), 'type="image/webp"')
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Создано: 1', out.getvalue())
+        self.assertIsNotNone(thumbnails.manifest(name))
+        self.assertContains(Client().get(address), 'type="image/webp"')
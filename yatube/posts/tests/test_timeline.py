@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import tasks
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, User
+
+
+@override_settings(
+    TIMELINE_ENABLED=True, TIMELINE_DEPTH=3, TIMELINE_FANOUT_LIMIT=1
+)
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+
+    def feed(self, user):
+        return list(
+            timeline.follow_feed(user).order_by('-pub_date', '-pk')
+        )
+
+    def test_post_is_fanned_out_and_trimmed(self):
+        """Новый пост попадает в ленту, лента обрезается до глубины."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.settings(TASKS_EAGER=False):
+            posts = [
+                Post.objects.create(text=f'Пост {i}', author=self.author)
+                for i in range(5)
+            ]
+            tasks.run_pending()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(self.feed(self.reader), posts[:1:-1])
+
+    def test_follow_and_unfollow_update_timeline(self):
+        """Подписка добавляет посты автора в ленту, отписка убирает."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(self.reader), [post])
+        follow.delete()
+        self.assertEqual(self.feed(self.reader), [])
+
+    def test_popular_author_is_read_on_demand(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(self.reader), [post])
+        self.assertEqual(self.feed(self.other), [post])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timeline пересобирает ленту из подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(2)
+        ]
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_timeline', 'reader', stdout=out)
+        self.assertIn('reader: 2', out.getvalue())
+        self.assertEqual(self.feed(self.reader), posts[::-1])
@@ -62,6 +62,7 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user_1 = User.objects.create_user(username='HasNoName')
         self.authorized_client = Client()
@@ -270,10 +271,11 @@ class PostPagesTests(TestCase):
             image=self.upload,
         )
         response_1 = self.authorized_client.get(MAIN)
-        post.delete()
+        # Изменение в обход сигналов не сбрасывает кэш
+        Post.objects.filter(pk=post.pk).update(text='Без сброса кэша')
         response_2 = self.authorized_client.get(MAIN)
         self.assertEqual(response_1.content, response_2.content)
-        cache.clear()
+        post.delete()
         response_3 = self.authorized_client.get(MAIN)
         self.assertNotEqual(response_1.content, response_3.content)
 
@@ -326,3 +328,84 @@ class PostPagesTests(TestCase):
         follow = Follow.objects.filter(user=self.author,
                                        author=self.author).count()
         self.assertEqual(follow, 0)
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        for number in range(settings.PAGE_SIZE + 1):
+            author = User.objects.create_user(username=f'author{number}')
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                text='Тестовый текст', author=author, group=cls.group
+            )
+            Comment.objects.create(
+                text='Комментарий', author=cls.reader, post=post
+            )
+        cls.post = post
+        cls.PROFILE = reverse('posts:profile', args=[author.username])
+        cls.POST_PAGE = reverse('posts:post_detail', args=[post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feed_query_budget(self):
+        """Ленты укладываются в постоянное число запросов."""
+        budgets = (
+            (self.guest_client, MAIN, 1),
+            (self.guest_client, GROUP_LIST, 2),
+            (self.guest_client, self.PROFILE, 2),
+            (self.guest_client, self.POST_PAGE, 2),
+            (self.authorized_client, FOLLOW_INDEX, 3),
+        )
+        for client, url, queries in budgets:
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    client.get(url)
+
+    def test_post_detail_budget_does_not_grow_with_comments(self):
+        """Комментарии на странице поста не добавляют запросов."""
+        for number in range(5):
+            commenter = User.objects.create_user(username=f'commenter{number}')
+            Comment.objects.create(
+                text='Комментарий', author=commenter, post=self.post
+            )
+        with self.assertNumQueries(2):
+            self.guest_client.get(self.POST_PAGE)
+
+    def test_comments_paginated_by_cursor(self):
+        """Комментарии выводятся страницами, остальные — фрагментом."""
+        Comment.objects.bulk_create(
+            Comment(text=f'Еще {number}', author=self.reader, post=self.post)
+            for number in range(settings.COMMENTS_PAGE_SIZE)
+        )
+        response = self.guest_client.get(self.POST_PAGE)
+        page = response.context['comments_page']
+        self.assertEqual(len(page), settings.COMMENTS_PAGE_SIZE)
+        fragment = reverse('posts:post_comments', args=[self.post.pk])
+        self.assertContains(response, fragment)
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(
+                fragment, {'after': page.next_cursor()}
+            )
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments_page']],
+            [f'Еще {settings.COMMENTS_PAGE_SIZE - 1}'],
+        )
+        self.assertIsNone(response.context['comments_page'].next_cursor())
+        # Битый курсор не возвращает к первым комментариям
+        response = self.guest_client.get(fragment, {'after': 'не-курсор'})
+        self.assertEqual(response.status_code, 400)
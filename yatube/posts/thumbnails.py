@@ -0,0 +1,274 @@
+"""
+Картинки заметок: подготовка исходника и варианты для srcset.
+
+После сохранения заметки с новой картинкой фоновая задача (core.tasks):
+- переписывает исходник без EXIF и других метаданных, повернутым по
+  EXIF и не больше ORIGINAL_MAX_SIDE по длинной стороне;
+- для каждого размера из SPECS создает варианты шириной WIDTHS в
+  форматах FORMATS (AVIF, если его умеет Pillow, WebP и JPEG);
+- записывает их имена в манифест картинки — свой небольшой JSON-файл в
+  MEDIA_ROOT у каждой картинки, так что воркеры в разных процессах
+  пишут манифесты независимо и запись не зависит от их числа;
+- сбрасывает кэш лент и страниц с заметками этой картинки.
+
+Шаблоны берут адреса из манифеста, не открывая картинку и не обращаясь
+к хранилищу ключей, и выводят <picture> с srcset, так что браузер
+скачивает вариант под свой экран. Пока вариантов нет, показывается
+исходная картинка. Имя исходника — хэш его содержимого (core.storage),
+поэтому одинаковые картинки делят одни варианты и повторно не
+обрабатываются.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from core.tasks import LOW, task
+
+from . import feed_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Размеры: пропорции и основная ширина; обрезка по центру
+SPECS = {
+    'card': (960, 339),
+}
+WIDTHS = (320, 640, 960, 1440, 1920)
+ORIGINAL_MAX_SIDE = 2048
+METADATA = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+MANIFEST_DIR = os.path.join('cache', 'thumbnails', 'manifest')
+QUALITY = 85
+
+Image.init()
+# От самого сжатого к запасному: браузер берет первый понятный ему
+FORMATS = [
+    name for name in ('avif', 'webp') if name.upper() in Image.SAVE
+] + ['jpeg']
+MIME_TYPES = {
+    'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg',
+}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def manifest_path(name):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return os.path.join(
+        settings.MEDIA_ROOT, MANIFEST_DIR, digest[:2], f'{digest}.json'
+    )
+
+
+def manifest(name):
+    """Манифест картинки {размер: варианты} или None, пока его нет."""
+    try:
+        with open(manifest_path(name), encoding='utf-8') as entry:
+            return json.load(entry)
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path, content):
+    """
+    Пишет файл через временный и os.replace: читатели видят прежний или
+    новый файл целиком, а не пустое место между удалением и записью.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as output:
+        output.write(content)
+    os.replace(temporary, path)
+
+
+def _write(path, data):
+    _atomic_write(path, json.dumps(data, ensure_ascii=False).encode())
+
+
+def record(thumbnails):
+    """Записывает манифесты {картинка: {размер: варианты}} атомарно."""
+    for name, entry in thumbnails.items():
+        _write(manifest_path(name), entry)
+
+
+def forget(name):
+    """Удаляет варианты картинки и ее манифест."""
+    entry = manifest(name)
+    if entry is None:
+        return
+    try:
+        os.remove(manifest_path(name))
+    except FileNotFoundError:
+        pass
+    for spec in entry.values():
+        for image_format in FORMATS:
+            for _, variant in spec.get(image_format, ()):
+                default_storage.delete(variant)
+
+
+def variant_name(name, spec, width, image_format):
+    digest = hashlib.md5(f'{name}:{spec}:{width}'.encode()).hexdigest()
+    extension = EXTENSIONS[image_format]
+    return f'cache/thumbnails/{digest[:2]}/{digest}.{extension}'
+
+
+def _replace(name, content):
+    # Имя остается прежним: исходник адресуется хэшем загрузки, и
+    # хранилище не должно выдать вместо него имя с суффиксом
+    _atomic_write(default_storage.path(name), content)
+    return name
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def flatten(image):
+    """Картинка без прозрачности для JPEG: прозрачное — белым."""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def normalize(name, image):
+    """
+    Переписывает исходник с метаданными или слишком большой: поворот по
+    EXIF, ограничение размеров, тот же формат. Анимацию не трогает.
+    Возвращает картинку, из которой строятся варианты.
+    """
+    if getattr(image, 'n_frames', 1) > 1:
+        return image
+    if (
+        max(image.size) <= ORIGINAL_MAX_SIDE
+        and not any(key in image.info for key in METADATA)
+    ):
+        return image
+    image_format = image.format
+    icc_profile = image.info.get('icc_profile')
+    result = ImageOps.exif_transpose(image)
+    result.thumbnail((ORIGINAL_MAX_SIDE, ORIGINAL_MAX_SIDE), Image.LANCZOS)
+    # PNG и WebP иначе сохранили бы EXIF из info
+    result.info = {}
+    params = {'quality': QUALITY} if image_format == 'JPEG' else {}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    content = io.BytesIO()
+    result.save(content, image_format, **params)
+    _replace(name, content.getvalue())
+    return result
+
+
+def widths(image):
+    """Ширины вариантов: не шире исходника, но хотя бы одна."""
+    return [
+        width for width in WIDTHS if width <= image.width
+    ] or [WIDTHS[0]]
+
+
+def render_spec(name, image, spec, size):
+    variants = {image_format: [] for image_format in FORMATS}
+    for width in widths(image):
+        height = round(width * size[1] / size[0])
+        fitted = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for image_format, saved in variants.items():
+            content = io.BytesIO()
+            # AVIF и WebP сохраняют прозрачность, JPEG — нет
+            frame = flatten(fitted) if image_format == 'jpeg' else fitted
+            frame.save(content, image_format.upper(), quality=QUALITY)
+            saved.append([width, _replace(
+                variant_name(name, spec, width, image_format),
+                content.getvalue(),
+            )])
+    # src для браузеров без srcset — основная ширина размера или меньше
+    src = [name for width, name in variants['jpeg'] if width <= size[0]]
+    return {'src': (src or [variants['jpeg'][0][1]])[-1], **variants}
+
+
+def render(name):
+    """
+    Готовит исходник и создает варианты картинки, возвращает
+    {размер: {'src': имя, формат: [[ширина, имя], ...]}}.
+    """
+    # n_frames у GIF перечитывает файл, поэтому картинка — в памяти
+    with default_storage.open(name) as source:
+        image = Image.open(io.BytesIO(source.read()))
+    image = normalize(name, image)
+    image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+    return {
+        spec: render_spec(name, image, spec, size)
+        for spec, size in SPECS.items()
+    }
+
+
+def refresh_pages(names):
+    """
+    Сбрасывает ленты и страницы заметок с этими картинками: в кэше они
+    показывают исходную картинку без вариантов.
+    """
+    for post in Post.objects.filter(image__in=names).select_related(
+        'author', 'group'
+    ):
+        feed_cache.bump_for_post(post)
+
+
+def generate(name):
+    record({name: render(name)})
+    refresh_pages([name])
+
+
+@task(priority=LOW)
+def generate_missing(name):
+    # Та же картинка уже загружалась: варианты у нее общие
+    if manifest(name) is None:
+        generate(name)
+
+
+def schedule(name):
+    """Ставит создание вариантов картинки в очередь задач (core.tasks)."""
+    generate_missing.delay(name, key=f'thumbnails:{name}')
+
+
+def variants(image, spec):
+    """Запись манифеста для размера или None, пока вариантов нет."""
+    return (manifest(image.name) or {}).get(spec)
+
+
+def url(image, spec):
+    """Адрес основного варианта из манифеста или исходной картинки."""
+    entry = variants(image, spec)
+    if entry is None:
+        return image.url
+    return default_storage.url(entry['src'])
+
+
+def srcset(entry, image_format):
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w'
+        for width, name in entry[image_format]
+    )
+
+
+def picture(image, spec):
+    """
+    Данные для <picture>: источники в порядке FORMATS (MIME-тип и srcset)
+    без запасного JPEG, адрес и srcset для <img>.
+    """
+    entry = variants(image, spec)
+    if entry is None:
+        return {'sources': [], 'src': image.url, 'srcset': ''}
+    return {
+        'sources': [
+            (MIME_TYPES[image_format], srcset(entry, image_format))
+            for image_format in FORMATS if image_format != 'jpeg'
+        ],
+        'src': default_storage.url(entry['src']),
+        'srcset': srcset(entry, 'jpeg'),
+    }
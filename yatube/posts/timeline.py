@@ -0,0 +1,128 @@
+"""
+Материализованная лента подписок (fan-out-on-write).
+
+При публикации пост раскладывается фоновой задачей (core.tasks) в ленты
+подписчиков автора, а лента каждого пользователя обрезается до
+TIMELINE_DEPTH записей.
+Посты популярных авторов (больше TIMELINE_FANOUT_LIMIT подписчиков)
+не раскладываются: они подмешиваются в ленту при чтении.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from core.tasks import HIGH, task
+
+from . import counters
+from .models import Follow, Post, TimelineEntry
+
+
+def is_enabled():
+    return getattr(settings, 'TIMELINE_ENABLED', False)
+
+
+def is_popular(author):
+    followers = counters.for_user(author).followers_count
+    return followers > settings.TIMELINE_FANOUT_LIMIT
+
+
+def popular_authors(user):
+    """Авторы из подписок пользователя, чьи посты не раскладываются."""
+    return Follow.objects.filter(
+        user=user,
+        author__counters__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('author')
+
+
+def follow_feed(user):
+    """Посты ленты подписок пользователя."""
+    if not is_enabled():
+        return Post.objects.filter(author__following__user=user)
+    return Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=popular_authors(user))
+    )
+
+
+def trim(users):
+    """
+    Обрезает ленты пользователей (список или подзапрос) до
+    TIMELINE_DEPTH записей.
+    """
+    depth = settings.TIMELINE_DEPTH
+    overflown = TimelineEntry.objects.filter(
+        user__in=users
+    ).values('user').annotate(
+        count=Count('pk')
+    ).filter(count__gt=depth).values_list('user', flat=True)
+    for user_id in overflown:
+        newest = TimelineEntry.objects.filter(user=user_id).order_by(
+            '-post__pub_date', '-post__pk'
+        ).values_list('pk', flat=True)[:depth]
+        TimelineEntry.objects.filter(user=user_id).exclude(
+            pk__in=list(newest)
+        ).delete()
+
+
+@transaction.atomic
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    # Одного лишнего подписчика хватает, чтобы узнать популярного автора
+    user_ids = list(Follow.objects.filter(
+        author=post.author_id
+    ).values_list('user', flat=True)[:limit + 1])
+    if len(user_ids) > limit:
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+    # Переполниться могли только ленты, в которые пост только что попал
+    trim(user_ids)
+
+
+@task(priority=HIGH)
+def fan_out_post(post_id):
+    """Задача очереди: раскладка поста после публикации."""
+    post = Post.objects.filter(pk=post_id).first()
+    # Пост могли удалить, пока задача ждала в очереди
+    if post is not None:
+        fan_out(post)
+
+
+@transaction.atomic
+def add_author(user, author):
+    """Добавляет в ленту свежие посты автора после подписки."""
+    if is_popular(author):
+        return
+    posts = Post.objects.filter(author=author).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', flat=True)[:settings.TIMELINE_DEPTH]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user=user, post_id=post_id) for post_id in posts),
+        ignore_conflicts=True,
+    )
+    trim([user])
+
+
+def remove_author(user, author):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+@transaction.atomic
+def rebuild(user):
+    """Пересобирает ленту пользователя по таблице подписок."""
+    TimelineEntry.objects.filter(user=user).delete()
+    posts = Post.objects.filter(
+        author__following__user=user
+    ).exclude(
+        author__in=popular_authors(user)
+    ).order_by('-pub_date', '-pk').values_list(
+        'pk', flat=True
+    )[:settings.TIMELINE_DEPTH]
+    entries = TimelineEntry.objects.bulk_create(
+        TimelineEntry(user=user, post_id=post_id) for post_id in posts
+    )
+    return len(entries)
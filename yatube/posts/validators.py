@@ -1,4 +1,7 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
 
 
 def validate_not_empty(value):
@@ -8,3 +11,42 @@ def validate_not_empty(value):
             'А кто поле будет заполнять, Пушкин?',
             params={'value': value},
         )
+
+
+def validate_upload_size(upload):
+    if upload.size > settings.UPLOAD_MAX_BYTES:
+        raise forms.ValidationError(
+            'Файл больше %(limit)s.',
+            params={'limit': filesizeformat(settings.UPLOAD_MAX_BYTES)},
+        )
+
+
+def validate_image_header(upload):
+    """
+    Проверяет размер файла, формат и размеры картинки по заголовку, не
+    декодируя пиксели.
+    """
+    validate_upload_size(upload)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise forms.ValidationError('Слишком большая картинка.')
+    except Exception:
+        raise forms.ValidationError(
+            'Загрузите картинку. Файл не является картинкой '
+            'или поврежден.'
+        )
+    if image.format not in settings.IMAGE_UPLOAD_FORMATS:
+        raise forms.ValidationError(
+            'Формат %(format)s не поддерживается.',
+            params={'format': image.format},
+        )
+    width, height = image.size
+    if (
+        max(width, height) > settings.IMAGE_UPLOAD_MAX_SIDE
+        or width * height > settings.IMAGE_UPLOAD_MAX_PIXELS
+    ):
+        raise forms.ValidationError(
+            'Картинка %(width)d×%(height)d больше допустимой.',
+            params={'width': width, 'height': height},
+        )
@@ -1,20 +1,41 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from core.concurrent import gather
+
+from . import counters, feed_cache, page_cache, thumbnails
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .paginator import paginate
+from .search import posts_matching
+from .timeline import follow_feed
+
+
+def feed_page(request, post_list, feed):
+    """
+    Страница ленты: автор, группа и счетчики заметки берутся тем же
+    запросом, что и сами заметки. Ключ фрагмента для {% feedcache %}
+    строится до запроса, по версиям ленты на этот момент.
+    """
+    fragment_key = feed_cache.fragment_key(feed, request.GET.urlencode())
+    page = paginate(
+        request,
+        post_list.select_related('author', 'group', 'counters'),
+        feed=feed,
+    )
+    page.fragment_key = fragment_key
+    return page
 
 
 def index(request):
     template = 'posts/index.html'
     title = "Последние обновления на сайте"
-    post_list = Post.objects.select_related('group').all(
-    ).order_by('-pub_date')
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.all()
+    page_obj = feed_page(request, post_list, feed_cache.feed_id('global'))
     context = {
         'title': title,
         'page_obj': page_obj,
@@ -27,12 +48,10 @@ def index(request):
 def follow_index(request):
     template = 'posts/follow.html'
     title = "Ваши подписки"
-    post_list = Post.objects.filter(
-        author__following__user=request.user
-    ).order_by('-pub_date')
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = follow_feed(request.user)
+    page_obj = feed_page(
+        request, post_list, feed_cache.feed_id('follow', request.user.pk)
+    )
     context = {
         'page_obj': page_obj,
         'title': title,
@@ -44,10 +63,10 @@ def follow_index(request):
 def group_posts(request, gr):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=gr)
-    post_list = group.group_list.order_by('-pub_date')
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.group_list.all()
+    page_obj = feed_page(
+        request, post_list, feed_cache.feed_id('group', group.slug)
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -57,13 +76,15 @@ def group_posts(request, gr):
 
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
     author_list = Post.objects.filter(
         author=author
-    ).order_by('-pub_date')
-    paginator = Paginator(author_list, settings.PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    )
+    page_obj = feed_page(
+        request, author_list, feed_cache.feed_id('author', author.pk)
+    )
     following = False
     if request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author
@@ -72,16 +93,51 @@ def profile(request, username):
     context = {
         'page_obj': page_obj,
         'author': author,
+        'author_counters': counters.for_user(author),
         'following': following,
     }
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        post_list = posts_matching(form.cleaned_data['q'])
+        if form.cleaned_data['group']:
+            post_list = post_list.filter(group=form.cleaned_data['group'])
+        if form.cleaned_data['author']:
+            post_list = post_list.filter(
+                author__username=form.cleaned_data['author']
+            )
+        page_obj = paginate(
+            request,
+            post_list.select_related('author', 'group', 'counters'),
+            ordering=('-rank', '-pk'),
+        )
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    one_post = get_object_or_404(Post, pk=post_id)
+    # Заметка и первая страница комментариев не зависят друг от друга
+    one_post, comments = gather(
+        lambda: get_object_or_404(
+            Post.objects.select_related('author__counters', 'group'),
+            pk=post_id
+        ),
+        lambda: comments_page(request, post_id),
+    )
+    # Счетчики автора на странице: она устаревает вместе с его профилем
+    page_cache.depend(
+        request, feed_cache.feed_id('profile', one_post.author.username)
+    )
     form = CommentForm()
-    comments = one_post.comments.all()
     if one_post.author == request.user:
         is_author = True
     else:
@@ -89,13 +145,46 @@ def post_detail(request, post_id):
     context = {
         'one_post': one_post,
         'is_author': is_author,
-        'comments': comments,
+        'author_counters': counters.for_user(one_post.author),
+        'comments_page': comments,
         'form': form,
     }
     return render(request, template, context)
 
 
+def comments_page(request, post_id, strict=False):
+    """
+    Страница комментариев по курсору на (created, id): на странице поста
+    их не больше COMMENTS_PAGE_SIZE, сколько бы ни набралось всего.
+    """
+    return paginate(
+        request,
+        Comment.objects.filter(post=post_id).select_related('author'),
+        ordering=('created', 'pk'),
+        per_page=settings.COMMENTS_PAGE_SIZE,
+        strict=strict,
+    )
+
+
+def post_comments(request, post_id):
+    """
+    Фрагмент со следующей страницей комментариев для подгрузки. Битый
+    курсор — 400: первая страница продублировала бы комментарии.
+    """
+    one_post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    try:
+        page = comments_page(request, post_id, strict=True)
+    except InvalidPage:
+        return HttpResponseBadRequest('Неверный курсор')
+    context = {
+        'one_post': one_post,
+        'comments_page': page,
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     template = 'posts/post_create.html'
     form = PostForm(request.POST, files=request.FILES or None)
@@ -104,6 +193,8 @@ def post_create(request):
     form = form.save(commit=False)
     form.author = request.user
     form.save()
+    if form.image:
+        thumbnails.schedule(form.image.name)
     return redirect('posts:profile', form.author)
 
 
@@ -124,13 +215,17 @@ def post_edit(request, post_id):
                 template,
                 context={'form': form, 'is_edit': is_edit}
             )
+        image_changed = 'image' in form.changed_data
         form = form.save()
+        if image_changed and form.image:
+            thumbnails.schedule(form.image.name)
         return redirect('posts:post_detail', post_id)
     else:
         return redirect('posts:post_detail', post_id)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -143,6 +238,7 @@ def add_comment(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -151,6 +247,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follow = get_object_or_404(Follow, user=request.user,
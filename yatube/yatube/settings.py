@@ -1,4 +1,5 @@
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -13,6 +14,9 @@ SECRET_KEY = 'd7ctg6ml#v6i)i*j-q-a2s^ooe4e!fcnyvzqdo4-(1w70i8f^x'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+# запуск тестов: manage.py test или pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 ALLOWED_HOSTS = [
     '158.160.1.7'
     'localhost',
@@ -26,33 +30,40 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.page_cache.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# панель отладки пишет SQL и шаблоны каждого запроса: только для DEBUG
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS':
@@ -75,13 +86,65 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Профиль базы задается переменными окружения. По умолчанию - файл
+# SQLite для разработки и тестов; в работе - PostgreSQL (драйвер
+# psycopg2-binary из requirements.txt):
+# DB_ENGINE=django.db.backends.postgresql DB_NAME=yatube DB_HOST=...
+# Соединения постоянные (DB_CONN_MAX_AGE секунд) и проверяются перед
+# каждым запросом (core.db). Пул соединений держит PgBouncer в режиме
+# transaction, поэтому серверные курсоры отключаются
+# (DB_DISABLE_SERVER_SIDE_CURSORS=1). Реплики для чтения лент
+# перечисляются в DB_REPLICA_HOSTS через запятую.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get(
+            'DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS')
+        ),
     }
 }
 
+REPLICA_DATABASES = []
+for number, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1
+):
+    alias = f'replica{number}'
+    # В тестах реплика - зеркало основной базы, отдельная не создается
+    DATABASES[alias] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'}
+    )
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Прагмы каждого соединения с SQLite (core.db.configure_sqlite). В журнале
+# WAL читатели не ждут записи, а synchronous=normal в нем не теряет
+# согласованности и не вызывает fsync на каждую транзакцию. busy_timeout -
+# сколько мс запись ждет блокировку, прежде чем ответить ошибкой.
+# Однопоточные окружения могут вернуть SQLITE_JOURNAL_MODE=delete.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение - размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+}
+
+# сколько секунд после записи чтение идет из основной базы, пока
+# реплики догоняют ее (cookie core.middleware.PrimaryPinMiddleware)
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -132,17 +195,130 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# адрес сайта для ссылок в письмах
+SITE_URL = os.environ.get('SITE_URL', '')
+
+# дайджесты новых заметок подписок (posts.digest): заметки копятся
+# DIGEST_WINDOW секунд, письма уходят пачками по DIGEST_BATCH_SIZE через
+# одно соединение, не быстрее DIGEST_RATE писем в секунду (0 - без
+# ограничения); в письме не больше DIGEST_MAX_POSTS заметок. Включаются
+# явно (DIGEST_ENABLED=1) и только вместе с SITE_URL: без него проверка
+# posts.E001 не даст запустить проект
+DIGEST_ENABLED = os.environ.get('DIGEST_ENABLED', '0') == '1'
+DIGEST_WINDOW = 3600
+DIGEST_BATCH_SIZE = 100
+DIGEST_RATE = 10
+DIGEST_MAX_POSTS = 20
+
 # количество объектов на странице
 PAGE_SIZE = 10
 
+# комментариев на странице поста и в каждой подгрузке
+COMMENTS_PAGE_SIZE = 20
+
+# материализованная лента подписок: пост раскладывается по лентам
+# подписчиков при публикации, лента обрезается до TIMELINE_DEPTH записей;
+# посты авторов с числом подписчиков больше TIMELINE_FANOUT_LIMIT
+# подмешиваются при чтении. Раскладку выполняют воркеры run_tasks, поэтому
+# лента включается явно (TIMELINE_ENABLED=1), когда они запущены, а
+# существующие ленты заполняет manage.py rebuild_timeline; без нее лента
+# подписок собирается при чтении
+TIMELINE_ENABLED = os.environ.get('TIMELINE_ENABLED', '0') == '1'
+TIMELINE_DEPTH = 500
+TIMELINE_FANOUT_LIMIT = 1000
+
+# время жизни фрагментов лент в кэше; сброс при изменениях идет через
+# версии лент (posts.feed_cache), TTL лишь ограничивает память
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# страницы для анонимных посетителей (posts.page_cache): свежими
+# считаются PAGE_CACHE_TIMEOUT секунд или до изменения их лент, затем еще
+# PAGE_CACHE_STALE секунд отдаются, пока один запрос их пересобирает
+PAGE_CACHE_TIMEOUT = 60
+PAGE_CACHE_STALE = 5 * 60
+
+# потоков для независимых запросов одной страницы (core.concurrent);
+# 0 - выполнять их по очереди. Выигрыш есть, когда база по сети: у
+# локального SQLite ожидания нет, и потоки только спорят за GIL
+CONCURRENT_QUERY_WORKERS = int(os.environ.get(
+    'CONCURRENT_QUERY_WORKERS', 0 if DB_ENGINE.endswith('sqlite3') else 4
+))
+
+# метрики запросов (core.middleware.RequestMetricsMiddleware): заголовок
+# Server-Timing, порог медленного запроса в ms и доля медленных запросов,
+# которые пишутся в лог вместе со списком SQL
+REQUEST_METRICS_SERVER_TIMING = True
+REQUEST_METRICS_SLOW_MS = 500
+REQUEST_METRICS_SLOW_SAMPLE = 1.0
+
+# метрики всех запросов пишутся в core.requests на уровне INFO;
+# по умолчанию в лог попадают только медленные запросы
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# фоновые задачи (core.tasks): очередь в таблице core.Task, воркеры -
+# manage.py run_tasks. При TASKS_EAGER задачи выполняются без очереди,
+# после фиксации транзакции запроса: так по умолчанию работают тесты
+TASKS_EAGER = os.environ.get('TASKS_EAGER', '1' if TESTING else '0') == '1'
+TASKS_MAX_ATTEMPTS = 5
+# секунд до повтора упавшей задачи, с каждой попыткой вдвое больше
+TASKS_RETRY_DELAY = 10
+# секунд на выполнение, потом задачу заберет другой воркер
+TASKS_LEASE = 300
+TASKS_POLL_INTERVAL = 1
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# загрузки пишутся во временный файл кусками (core.uploads); картинка
+# заметки проверяется по заголовку (posts.forms.PostForm.clean_image) до
+# декодирования, которое делает фоновая задача миниатюр
+FILE_UPLOAD_HANDLERS = ['core.uploads.MeasuredTemporaryFileUploadHandler']
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 10 * 2 ** 20))
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_UPLOAD_MAX_SIDE = 8000
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# секунд до удаления картинки без ссылок (posts.media)
+MEDIA_DELETE_DELAY = 10 * 60
+
+# Кэш общий для всех процессов сервера: файлы в CACHE_LOCATION с
+# вытеснением давно не читанных записей (core.cache). CACHE_BACKEND=locmem
+# возвращает кэш в памяти процесса; он же по умолчанию в тестах, чтобы
+# их cache.clear() не очищал кэш запущенного рядом сервера.
+CACHE_BACKENDS = {
+    'file': 'core.cache.LRUFileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[os.environ.get(
+            'CACHE_BACKEND', 'locmem' if TESTING else 'file'
+        )],
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+            'CULL_EVERY': 20,
+        },
     }
 }
 